@@ -1,13 +1,22 @@
 """WS-Discovery service for ONVIF device discovery."""
 
 import asyncio
+import collections
+import functools
 import logging
+import re
 import socket
 import struct
+import time
 import uuid
 from datetime import datetime, timezone
+from typing import Optional, Tuple
+from xml.sax.saxutils import escape
+
+from lxml import etree
 
 from src.config import Config
+from src.utils.soap_utils import compact_xml
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +25,130 @@ WS_DISCOVERY_PORT = 3702
 WS_DISCOVERY_MULTICAST = "239.255.255.250"
 WS_DISCOVERY_NS = "http://schemas.xmlsoap.org/ws/2005/04/discovery"
 
+# Per-message slots left open when the templates below are prerendered
+_SLOT_RE = re.compile(rb'__(?:MESSAGE_ID|RELATES_TO)__')
+
+# Probe classification runs on the raw datagram bytes in a single pass
+_PROBE_RE = re.compile(rb'(Probe)|(NetworkVideoTransmitter)')
+
+# Probes carry their wsa:MessageID in the header, so it is usually found
+# within the first chunk fed to the pull parser
+_MESSAGE_ID_TAG = '{*}MessageID'
+_MESSAGE_ID_CHUNK = 512
+
+# Probes answered per window; anything beyond that is dropped as a flood
+PROBE_RATE_LIMIT = 50
+PROBE_RATE_WINDOW = 1.0
+
+# Repeats of an answered Probe (same address and MessageID) within this many
+# seconds are not answered again
+PROBE_DEDUP_WINDOW = 0.5
+PROBE_DEDUP_PRUNE_INTERVAL = 256
+
+HELLO_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope 
+    xmlns:soap="http://www.w3.org/2003/05/soap-envelope"
+    xmlns:wsa="http://schemas.xmlsoap.org/ws/2004/08/addressing"
+    xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery"
+    xmlns:dn="http://www.onvif.org/ver10/network/wsdl">
+    <soap:Header>
+        <wsa:MessageID>urn:uuid:__MESSAGE_ID__</wsa:MessageID>
+        <wsa:To>urn:schemas-xmlsoap-org:ws:2005:04:discovery</wsa:To>
+        <wsa:Action>http://schemas.xmlsoap.org/ws/2005/04/discovery/Hello</wsa:Action>
+    </soap:Header>
+    <soap:Body>
+        <d:Hello>
+            <wsa:EndpointReference>
+                <wsa:Address>urn:uuid:{hardware_id}</wsa:Address>
+            </wsa:EndpointReference>
+            <d:Types>dn:NetworkVideoTransmitter</d:Types>
+            <d:Scopes>onvif://www.onvif.org/type/video_encoder onvif://www.onvif.org/type/Network_Video_Transmitter onvif://www.onvif.org/Profile/Streaming onvif://www.onvif.org/hardware/{camera_model} onvif://www.onvif.org/name/{camera_name}</d:Scopes>
+            <d:XAddrs>{xaddrs}</d:XAddrs>
+            <d:MetadataVersion>1</d:MetadataVersion>
+        </d:Hello>
+    </soap:Body>
+</soap:Envelope>'''
+
+BYE_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope 
+    xmlns:soap="http://www.w3.org/2003/05/soap-envelope"
+    xmlns:wsa="http://schemas.xmlsoap.org/ws/2004/08/addressing"
+    xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery">
+    <soap:Header>
+        <wsa:MessageID>urn:uuid:__MESSAGE_ID__</wsa:MessageID>
+        <wsa:To>urn:schemas-xmlsoap-org:ws:2005:04:discovery</wsa:To>
+        <wsa:Action>http://schemas.xmlsoap.org/ws/2005/04/discovery/Bye</wsa:Action>
+    </soap:Header>
+    <soap:Body>
+        <d:Bye>
+            <wsa:EndpointReference>
+                <wsa:Address>urn:uuid:{hardware_id}</wsa:Address>
+            </wsa:EndpointReference>
+        </d:Bye>
+    </soap:Body>
+</soap:Envelope>'''
+
+PROBE_MATCH_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope 
+    xmlns:soap="http://www.w3.org/2003/05/soap-envelope"
+    xmlns:wsa="http://schemas.xmlsoap.org/ws/2004/08/addressing"
+    xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery"
+    xmlns:dn="http://www.onvif.org/ver10/network/wsdl">
+    <soap:Header>
+        <wsa:MessageID>urn:uuid:__MESSAGE_ID__</wsa:MessageID>
+        <wsa:RelatesTo>__RELATES_TO__</wsa:RelatesTo>
+        <wsa:To>http://schemas.xmlsoap.org/ws/2004/08/addressing/role/anonymous</wsa:To>
+        <wsa:Action>http://schemas.xmlsoap.org/ws/2005/04/discovery/ProbeMatches</wsa:Action>
+        <d:AppSequence InstanceId="{instance_id}" MessageNumber="1"/>
+    </soap:Header>
+    <soap:Body>
+        <d:ProbeMatches>
+            <d:ProbeMatch>
+                <wsa:EndpointReference>
+                    <wsa:Address>urn:uuid:{hardware_id}</wsa:Address>
+                </wsa:EndpointReference>
+                <d:Types>dn:NetworkVideoTransmitter</d:Types>
+                <d:Scopes>onvif://www.onvif.org/type/video_encoder onvif://www.onvif.org/type/Network_Video_Transmitter onvif://www.onvif.org/Profile/Streaming onvif://www.onvif.org/hardware/{camera_model} onvif://www.onvif.org/name/{camera_name}</d:Scopes>
+                <d:XAddrs>{xaddrs}</d:XAddrs>
+                <d:MetadataVersion>1</d:MetadataVersion>
+            </d:ProbeMatch>
+        </d:ProbeMatches>
+    </soap:Body>
+</soap:Envelope>'''
+
+
+def _new_uuid() -> bytes:
+    """Return a random UUID in dashed URN form, as ASCII bytes ready to splice in."""
+    u = uuid.uuid4().hex.encode('ascii')
+    return b"-".join((u[:8], u[8:12], u[12:16], u[16:20], u[20:]))
+
+
+class _WsdProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol handing received WS-Discovery packets to the service."""
+    
+    def __init__(self, service: 'WsDiscoveryService'):
+        self.service = service
+        self.transport = None
+        self._sendto = None
+        
+    def connection_made(self, transport: asyncio.DatagramTransport):
+        self.transport = transport
+        self._sendto = transport.sendto
+        
+    def datagram_received(self, data: bytes, addr: tuple):
+        # Processing is CPU-only and UDP sends never block, so handle the
+        # packet inline rather than spawning a task per datagram
+        reply = self.service._process_message(data, addr)
+        if reply is not None:
+            # Send unicast response to the probe source
+            probe_match, probe_key = reply
+            self._sendto(probe_match, addr)
+            self.service._record_reply(probe_key)
+            logger.info("Sent ProbeMatch to %s", addr)
+        
+    def error_received(self, exc: Exception):
+        logger.error("WS-Discovery error: %s", exc)
+
 
 class WsDiscoveryService:
     """WS-Discovery service for ONVIF device auto-detection."""
@@ -24,9 +157,30 @@ class WsDiscoveryService:
         self.config = config
         self.running = False
         self.socket = None
-        self.task = None
+        self.transport = None
+        self._multicast_send = None
         self.message_id = str(uuid.uuid4())
         
+        # Everything but the message IDs is fixed for the process lifetime,
+        # so the templates are rendered and encoded once up front
+        self._camera_name_safe = config.camera_name.replace(' ', '_')
+        self._instance_id = str(int(datetime.now(timezone.utc).timestamp()))
+        self._hello_prefix, self._hello_suffix = self._render(HELLO_TEMPLATE)
+        self._bye_prefix, self._bye_suffix = self._render(BYE_TEMPLATE)
+        self._probe_match_parts = self._render(PROBE_MATCH_TEMPLATE)
+        
+        # Outgoing messages are assembled in one long-lived buffer; the
+        # transport copies anything it has to queue, so it can be reused
+        self._send_buffer = bytearray(sum(map(len, self._probe_match_parts)) + 512)
+        self._send_view = memoryview(self._send_buffer)
+        
+        # Arrival times of the most recent Probes we answered
+        self._probe_times = collections.deque(maxlen=PROBE_RATE_LIMIT)
+        
+        # Last reply time per (address, MessageID), for coalescing retransmitted Probes
+        self._recent_probers = {}
+        self._probes_seen = 0
+        
     async def start(self):
         """Start the WS-Discovery service."""
         self.running = True
@@ -43,198 +197,191 @@ class WsDiscoveryService:
         # Bind to discovery port
         self.socket.bind(('', WS_DISCOVERY_PORT))
         
-        # Join multicast group
-        mreq = struct.pack("4sl", socket.inet_aton(WS_DISCOVERY_MULTICAST), socket.INADDR_ANY)
-        self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-        
-        # Set non-blocking
-        self.socket.setblocking(False)
+        # Join multicast group on the configured interface only, so multi-homed
+        # hosts don't deliver the same Probe once per NIC
+        group = socket.inet_aton(WS_DISCOVERY_MULTICAST)
+        try:
+            interface = socket.inet_aton(self.config.server_ip)
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, group + interface)
+        except OSError as e:
+            logger.warning("Cannot join multicast on %s (%s), using default interface", self.config.server_ip, e)
+            interface = struct.pack("!L", socket.INADDR_ANY)
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, group + interface)
+            
+        # Send Hello/Bye out of the same interface and don't receive them back
+        self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, interface)
+        self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 0)
         
-        # Start listener task
-        self.task = asyncio.create_task(self._listen())
+        # Let the event loop drive recvfrom directly from its selector
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: _WsdProtocol(self),
+            sock=self.socket
+        )
+        self._multicast_send = functools.partial(
+            self.transport.sendto,
+            addr=(WS_DISCOVERY_MULTICAST, WS_DISCOVERY_PORT)
+        )
         
         # Send initial Hello
         await self._send_hello()
         
-        logger.info(f"WS-Discovery service started on port {WS_DISCOVERY_PORT}")
+        logger.info("WS-Discovery service started on port %s", WS_DISCOVERY_PORT)
         
     async def stop(self):
         """Stop the WS-Discovery service."""
         self.running = False
         
-        # Send Bye message
-        await self._send_bye()
-        
-        if self.task:
-            self.task.cancel()
-            try:
-                await self.task
-            except asyncio.CancelledError:
-                pass
-                
-        if self.socket:
+        if self.transport:
+            # Send Bye message
+            await self._send_bye()
+            
+            # Closing the transport flushes pending sends and closes the socket
+            self.transport.close()
+            self.transport = None
+        elif self.socket:
             self.socket.close()
             
         logger.info("WS-Discovery service stopped")
         
-    async def _listen(self):
-        """Listen for WS-Discovery Probe messages."""
-        loop = asyncio.get_event_loop()
-        
-        while self.running:
-            try:
-                # Receive data
-                data, addr = await loop.run_in_executor(
-                    None, 
-                    lambda: self.socket.recvfrom(65535)
-                )
+    def _process_message(self, data: bytes, addr: tuple) -> Optional[Tuple[memoryview, tuple]]:
+        """Process incoming WS-Discovery message, returning the ProbeMatch to send back and its dedup key."""
+        try:
+            is_probe = is_nvt = False
+            for match in _PROBE_RE.finditer(data):
+                if match.group(1):
+                    is_probe = True
+                else:
+                    is_nvt = True
+                if is_probe and is_nvt:
+                    break
+                    
+            # Check if it's a Probe message
+            if not is_probe:
+                return None
                 
-                # Process the message
-                await self._process_message(data, addr)
+            relates_to = self._extract_message_id(data)
+            probe_key = (addr, relates_to)
+            
+            if self._is_duplicate(probe_key):
+                logger.debug("Ignoring repeated Probe from %s", addr)
+                return None
                 
-            except BlockingIOError:
-                await asyncio.sleep(0.1)
-            except Exception as e:
-                if self.running:
-                    logger.error(f"WS-Discovery error: {e}")
-                await asyncio.sleep(1)
+            if self._rate_limited():
+                logger.debug("Dropping Probe from %s - rate limit exceeded", addr)
+                return None
                 
-    async def _process_message(self, data: bytes, addr: tuple):
-        """Process incoming WS-Discovery message."""
-        try:
-            message = data.decode('utf-8')
-            
-            # Check if it's a Probe message
-            if 'Probe' in message and 'NetworkVideoTransmitter' in message:
-                logger.info(f"Received WS-Discovery Probe from {addr}")
-                await self._send_probe_match(addr)
-            elif 'Probe' in message:
+            if is_nvt:
+                logger.info("Received WS-Discovery Probe from %s", addr)
+            else:
                 # Generic probe - respond anyway
-                logger.debug(f"Received generic Probe from {addr}")
-                await self._send_probe_match(addr)
+                logger.debug("Received generic Probe from %s", addr)
+            return self._build_probe_match(relates_to), probe_key
                 
         except Exception as e:
-            logger.error(f"Error processing WS-Discovery message: {e}")
+            logger.error("Error processing WS-Discovery message: %s", e)
+            return None
+            
+    def _is_duplicate(self, probe_key: tuple) -> bool:
+        """Report whether this Probe was answered within the dedup window."""
+        last = self._recent_probers.get(probe_key)
+        return last is not None and time.monotonic() - last < PROBE_DEDUP_WINDOW
+        
+    def _record_reply(self, probe_key: tuple):
+        """Remember that a ProbeMatch was sent for this Probe."""
+        now = time.monotonic()
+        
+        # Keep the table bounded by periodically dropping expired entries
+        self._probes_seen += 1
+        if self._probes_seen % PROBE_DEDUP_PRUNE_INTERVAL == 0:
+            self._recent_probers = {
+                key: last for key, last in self._recent_probers.items()
+                if now - last < PROBE_DEDUP_WINDOW
+            }
+            
+        self._recent_probers[probe_key] = now
+        
+    def _rate_limited(self) -> bool:
+        """Record a Probe arrival and report whether the rate limit is exceeded."""
+        now = time.monotonic()
+        if len(self._probe_times) == PROBE_RATE_LIMIT and now - self._probe_times[0] < PROBE_RATE_WINDOW:
+            return True
+        self._probe_times.append(now)
+        return False
+            
+    def _extract_message_id(self, data: bytes) -> Optional[bytes]:
+        """Extract the wsa:MessageID from a Probe as escaped bytes, stopping as soon as it is parsed."""
+        parser = etree.XMLPullParser(
+            events=('end',),
+            tag=_MESSAGE_ID_TAG,
+            resolve_entities=False,
+            no_network=True
+        )
+        try:
+            for offset in range(0, len(data), _MESSAGE_ID_CHUNK):
+                parser.feed(data[offset:offset + _MESSAGE_ID_CHUNK])
+                for _, element in parser.read_events():
+                    if element.text and element.text.strip():
+                        return escape(element.text.strip()).encode('utf-8')
+                    return None
+        except etree.XMLSyntaxError as e:
+            logger.debug("Could not parse Probe MessageID: %s", e)
+        return None
+        
+    def _pack(self, *parts: bytes) -> memoryview:
+        """Assemble a message in the shared send buffer and return a view of it."""
+        size = sum(map(len, parts))
+        if size > len(self._send_buffer):
+            self._send_buffer = bytearray(size)
+            self._send_view = memoryview(self._send_buffer)
             
+        view = self._send_view
+        offset = 0
+        for part in parts:
+            end = offset + len(part)
+            view[offset:end] = part
+            offset = end
+        return view[:size]
+        
+    def _render(self, template: str) -> list:
+        """Render config values into a template and split it at its per-message slots."""
+        values = {
+            'hardware_id': self.config.hardware_id,
+            'camera_model': self.config.camera_model,
+            'camera_name': self._camera_name_safe,
+            'xaddrs': self.config.device_service_url,
+            'instance_id': self._instance_id,
+        }
+        rendered = compact_xml(template.format(**values).encode('utf-8'))
+        return _SLOT_RE.split(rendered)
+        
     async def _send_hello(self):
         """Send WS-Discovery Hello message."""
-        message_id = str(uuid.uuid4())
-        instance_id = str(int(datetime.now(timezone.utc).timestamp()))
-        
-        hello = f'''<?xml version="1.0" encoding="UTF-8"?>
-<soap:Envelope 
-    xmlns:soap="http://www.w3.org/2003/05/soap-envelope"
-    xmlns:wsa="http://schemas.xmlsoap.org/ws/2004/08/addressing"
-    xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery"
-    xmlns:dn="http://www.onvif.org/ver10/network/wsdl">
-    <soap:Header>
-        <wsa:MessageID>urn:uuid:{message_id}</wsa:MessageID>
-        <wsa:To>urn:schemas-xmlsoap-org:ws:2005:04:discovery</wsa:To>
-        <wsa:Action>http://schemas.xmlsoap.org/ws/2005/04/discovery/Hello</wsa:Action>
-    </soap:Header>
-    <soap:Body>
-        <d:Hello>
-            <wsa:EndpointReference>
-                <wsa:Address>urn:uuid:{self.config.hardware_id}</wsa:Address>
-            </wsa:EndpointReference>
-            <d:Types>dn:NetworkVideoTransmitter</d:Types>
-            <d:Scopes>
-                onvif://www.onvif.org/type/video_encoder
-                onvif://www.onvif.org/type/Network_Video_Transmitter
-                onvif://www.onvif.org/Profile/Streaming
-                onvif://www.onvif.org/hardware/{self.config.camera_model}
-                onvif://www.onvif.org/name/{self.config.camera_name.replace(' ', '_')}
-            </d:Scopes>
-            <d:XAddrs>{self.config.device_service_url}</d:XAddrs>
-            <d:MetadataVersion>1</d:MetadataVersion>
-        </d:Hello>
-    </soap:Body>
-</soap:Envelope>'''
+        message_id = _new_uuid()
+        hello = self._pack(self._hello_prefix, message_id, self._hello_suffix)
         
         try:
-            self.socket.sendto(
-                hello.encode('utf-8'),
-                (WS_DISCOVERY_MULTICAST, WS_DISCOVERY_PORT)
-            )
+            self._multicast_send(hello)
             logger.info("Sent WS-Discovery Hello message")
         except Exception as e:
-            logger.error(f"Error sending Hello: {e}")
+            logger.error("Error sending Hello: %s", e)
             
     async def _send_bye(self):
         """Send WS-Discovery Bye message."""
-        message_id = str(uuid.uuid4())
-        
-        bye = f'''<?xml version="1.0" encoding="UTF-8"?>
-<soap:Envelope 
-    xmlns:soap="http://www.w3.org/2003/05/soap-envelope"
-    xmlns:wsa="http://schemas.xmlsoap.org/ws/2004/08/addressing"
-    xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery">
-    <soap:Header>
-        <wsa:MessageID>urn:uuid:{message_id}</wsa:MessageID>
-        <wsa:To>urn:schemas-xmlsoap-org:ws:2005:04:discovery</wsa:To>
-        <wsa:Action>http://schemas.xmlsoap.org/ws/2005/04/discovery/Bye</wsa:Action>
-    </soap:Header>
-    <soap:Body>
-        <d:Bye>
-            <wsa:EndpointReference>
-                <wsa:Address>urn:uuid:{self.config.hardware_id}</wsa:Address>
-            </wsa:EndpointReference>
-        </d:Bye>
-    </soap:Body>
-</soap:Envelope>'''
+        message_id = _new_uuid()
+        bye = self._pack(self._bye_prefix, message_id, self._bye_suffix)
         
         try:
-            self.socket.sendto(
-                bye.encode('utf-8'),
-                (WS_DISCOVERY_MULTICAST, WS_DISCOVERY_PORT)
-            )
+            self._multicast_send(bye)
             logger.info("Sent WS-Discovery Bye message")
         except Exception as e:
-            logger.error(f"Error sending Bye: {e}")
+            logger.error("Error sending Bye: %s", e)
             
-    async def _send_probe_match(self, addr: tuple):
-        """Send WS-Discovery ProbeMatch response."""
-        message_id = str(uuid.uuid4())
-        relates_to = str(uuid.uuid4())  # Should extract from probe, but this works
-        instance_id = str(int(datetime.now(timezone.utc).timestamp()))
-        
-        probe_match = f'''<?xml version="1.0" encoding="UTF-8"?>
-<soap:Envelope 
-    xmlns:soap="http://www.w3.org/2003/05/soap-envelope"
-    xmlns:wsa="http://schemas.xmlsoap.org/ws/2004/08/addressing"
-    xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery"
-    xmlns:dn="http://www.onvif.org/ver10/network/wsdl">
-    <soap:Header>
-        <wsa:MessageID>urn:uuid:{message_id}</wsa:MessageID>
-        <wsa:RelatesTo>urn:uuid:{relates_to}</wsa:RelatesTo>
-        <wsa:To>http://schemas.xmlsoap.org/ws/2004/08/addressing/role/anonymous</wsa:To>
-        <wsa:Action>http://schemas.xmlsoap.org/ws/2005/04/discovery/ProbeMatches</wsa:Action>
-        <d:AppSequence InstanceId="{instance_id}" MessageNumber="1"/>
-    </soap:Header>
-    <soap:Body>
-        <d:ProbeMatches>
-            <d:ProbeMatch>
-                <wsa:EndpointReference>
-                    <wsa:Address>urn:uuid:{self.config.hardware_id}</wsa:Address>
-                </wsa:EndpointReference>
-                <d:Types>dn:NetworkVideoTransmitter</d:Types>
-                <d:Scopes>
-                    onvif://www.onvif.org/type/video_encoder
-                    onvif://www.onvif.org/type/Network_Video_Transmitter
-                    onvif://www.onvif.org/Profile/Streaming
-                    onvif://www.onvif.org/hardware/{self.config.camera_model}
-                    onvif://www.onvif.org/name/{self.config.camera_name.replace(' ', '_')}
-                </d:Scopes>
-                <d:XAddrs>{self.config.device_service_url}</d:XAddrs>
-                <d:MetadataVersion>1</d:MetadataVersion>
-            </d:ProbeMatch>
-        </d:ProbeMatches>
-    </soap:Body>
-</soap:Envelope>'''
-        
-        try:
-            # Send unicast response to the probe source
-            self.socket.sendto(probe_match.encode('utf-8'), addr)
-            logger.info(f"Sent ProbeMatch to {addr}")
-        except Exception as e:
-            logger.error(f"Error sending ProbeMatch: {e}")
+    def _build_probe_match(self, relates_to: Optional[bytes] = None) -> memoryview:
+        """Build a WS-Discovery ProbeMatch response."""
+        message_id = _new_uuid()
+        if relates_to is None:
+            # Probe without a usable MessageID - nothing to correlate with
+            relates_to = b"urn:uuid:" + _new_uuid()
+        head, middle, rest = self._probe_match_parts
+        return self._pack(head, message_id, middle, relates_to, rest)
@@ -29,6 +29,7 @@ class OnvifRtspBridge:
         self.discovery_service = None
         self.rtsp_proxy = None
         self.running = False
+        self._stop_event = asyncio.Event()
         
     async def start(self):
         """Start all services."""
@@ -66,9 +67,12 @@ class OnvifRtspBridge:
         logger.info("=" * 60)
         
     async def stop(self):
-        """Stop all services gracefully."""
+        """Stop all services gracefully (later calls are no-ops)."""
+        if not self.running:
+            return
         logger.info("Shutting down ONVIF-RTSP Bridge...")
         self.running = False
+        self._stop_event.set()
         
         if self.discovery_service:
             await self.discovery_service.stop()
@@ -86,16 +90,19 @@ class OnvifRtspBridge:
         await self.start()
         
         # Keep running until signaled to stop
-        while self.running:
-            await asyncio.sleep(1)
+        await self._stop_event.wait()
+        
+    def request_stop(self):
+        """Ask run() to return; the caller then stops the services."""
+        self._stop_event.set()
 
 
-def handle_signal(bridge: OnvifRtspBridge, loop: asyncio.AbstractEventLoop):
+def handle_signal(bridge: OnvifRtspBridge):
     """Handle shutdown signals."""
     def signal_handler():
         logger.info("Received shutdown signal")
-        asyncio.create_task(bridge.stop())
-        loop.stop()
+        # main() stops the services once run() returns
+        bridge.request_stop()
     return signal_handler
 
 
@@ -104,11 +111,11 @@ async def main():
     setup_logging()
     
     bridge = OnvifRtspBridge()
-    loop = asyncio.get_event_loop()
+    loop = asyncio.get_running_loop()
     
     # Setup signal handlers
     for sig in (signal.SIGTERM, signal.SIGINT):
-        loop.add_signal_handler(sig, handle_signal(bridge, loop))
+        loop.add_signal_handler(sig, handle_signal(bridge))
     
     try:
         await bridge.run()
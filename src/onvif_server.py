@@ -1,9 +1,12 @@
 """ONVIF Server implementation for Profile S compliance."""
 
 import logging
+import re
 from datetime import datetime, timezone
+from typing import Optional
 from aiohttp import web
 from lxml import etree
+from multidict import CIMultiDict
 
 from src.config import Config
 from src.services.device_service import DeviceService
@@ -13,6 +16,9 @@ from src.utils.soap_utils import SoapHandler
 
 logger = logging.getLogger(__name__)
 
+# SOAP 1.2 carries the action as a Content-Type parameter instead of a SOAPAction header
+_CONTENT_TYPE_ACTION_RE = re.compile(r';\s*action\s*=\s*"?([^";]+)')
+
 
 class OnvifServer:
     """ONVIF Profile S compliant server."""
@@ -29,14 +35,21 @@ class OnvifServer:
         self.media_service = MediaService(config, self.soap_handler)
         self.events_service = EventsService(config, self.soap_handler)
         
+        # SOAP endpoints share one handler that picks the service by path
+        self._services = {
+            '/onvif/device_service': self.device_service,
+            '/onvif/media_service': self.media_service,
+            '/onvif/events_service': self.events_service,
+        }
+        self._soap_headers = CIMultiDict({'Content-Type': 'application/soap+xml; charset=utf-8'})
+        
         # Setup routes
         self._setup_routes()
         
     def _setup_routes(self):
         """Setup HTTP routes for ONVIF services."""
-        self.app.router.add_post('/onvif/device_service', self._handle_device_service)
-        self.app.router.add_post('/onvif/media_service', self._handle_media_service)
-        self.app.router.add_post('/onvif/events_service', self._handle_events_service)
+        for path in self._services:
+            self.app.router.add_post(path, self._handle_soap)
         
         # GET endpoints for service discovery
         self.app.router.add_get('/onvif/device_service', self._handle_wsdl_request)
@@ -52,7 +65,7 @@ class OnvifServer:
         await self.runner.setup()
         self.site = web.TCPSite(self.runner, '0.0.0.0', self.config.onvif_port)
         await self.site.start()
-        logger.info(f"ONVIF server listening on port {self.config.onvif_port}")
+        logger.info("ONVIF server listening on port %s", self.config.onvif_port)
         
     async def stop(self):
         """Stop the ONVIF server."""
@@ -62,54 +75,28 @@ class OnvifServer:
             await self.runner.cleanup()
         logger.info("ONVIF server stopped")
         
-    async def _handle_device_service(self, request: web.Request) -> web.Response:
-        """Handle Device Service SOAP requests."""
-        try:
-            body = await request.read()
-            logger.debug(f"Device service request: {body[:500]}")
-            
-            response = await self.device_service.handle_request(body)
-            
-            return web.Response(
-                body=response,
-                content_type='application/soap+xml', charset='utf-8'
-            )
-        except Exception as e:
-            logger.exception(f"Error handling device service request: {e}")
-            return self._soap_fault("Server", str(e))
-            
-    async def _handle_media_service(self, request: web.Request) -> web.Response:
-        """Handle Media Service SOAP requests."""
-        try:
-            body = await request.read()
-            logger.debug(f"Media service request: {body[:500]}")
-            
-            response = await self.media_service.handle_request(body)
-            
-            return web.Response(
-                body=response,
-                content_type='application/soap+xml', charset='utf-8'
-            )
-        except Exception as e:
-            logger.exception(f"Error handling media service request: {e}")
-            return self._soap_fault("Server", str(e))
-            
-    async def _handle_events_service(self, request: web.Request) -> web.Response:
-        """Handle Events Service SOAP requests."""
+    async def _handle_soap(self, request: web.Request) -> web.Response:
+        """Handle SOAP requests for all ONVIF services."""
         try:
+            service = self._services[request.path]
             body = await request.read()
-            logger.debug(f"Events service request: {body[:500]}")
-            
-            response = await self.events_service.handle_request(body)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s request: %s", request.path, body[:500])
             
-            return web.Response(
-                body=response,
-                content_type='application/soap+xml', charset='utf-8'
-            )
+            response = service.handle_request(body, self._soap_action(request))
+            return web.Response(body=response, headers=self._soap_headers)
         except Exception as e:
-            logger.exception(f"Error handling events service request: {e}")
+            logger.exception("Error handling %s request: %s", request.path, e)
             return self._soap_fault("Server", str(e))
             
+    def _soap_action(self, request: web.Request) -> Optional[str]:
+        """Return the action URI from the SOAPAction header or Content-Type, if any."""
+        soap_action = request.headers.get('SOAPAction')
+        if soap_action:
+            return soap_action
+        match = _CONTENT_TYPE_ACTION_RE.search(request.headers.get('Content-Type', ''))
+        return match.group(1) if match else None
+        
     async def _handle_wsdl_request(self, request: web.Request) -> web.Response:
         """Handle WSDL/service discovery GET requests."""
         return web.Response(
@@ -130,8 +117,4 @@ class OnvifServer:
     def _soap_fault(self, code: str, message: str) -> web.Response:
         """Generate a SOAP fault response."""
         fault = self.soap_handler.create_fault(code, message)
-        return web.Response(
-            body=fault,
-            status=500,
-            content_type='application/soap+xml', charset='utf-8'
-        )
+        return web.Response(body=fault, status=500, headers=self._soap_headers)
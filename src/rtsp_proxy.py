@@ -1,41 +1,65 @@
 """RTSP Proxy for forwarding streams from HikVision to ONVIF clients."""
 
 import asyncio
+import json
 import logging
 import subprocess
 import os
-from typing import Optional
+import shutil
+import tempfile
+from collections import deque
+from contextlib import suppress
+from typing import Awaitable, Callable, Optional
 
 from src.config import Config
 
 logger = logging.getLogger(__name__)
 
+# Restart backoff for crashed subprocesses, in seconds; a process that stayed
+# up for at least RESTART_DELAY_MAX is considered healthy and resets it
+RESTART_DELAY_MIN = 5
+RESTART_DELAY_MAX = 60
+STOP_TIMEOUT = 5
+
+# mediamtx is ready once its RTSP port accepts connections; poll for that
+# instead of sleeping a fixed time
+READY_TIMEOUT = 5
+READY_POLL_INTERVAL = 0.05
+
+# Subprocess output is read continuously so the pipe never fills and blocks
+# the process; the last lines are kept for error reports
+OUTPUT_TAIL_LINES = 10
+
 
 class RtspProxy:
-    """RTSP Proxy using mediamtx + FFmpeg for stream forwarding."""
+    """RTSP Proxy using mediamtx, which pulls the source stream itself."""
 
     def __init__(self, config: Config):
         self.config = config
-        self.mediamtx_process: Optional[subprocess.Popen] = None
-        self.ffmpeg_process: Optional[subprocess.Popen] = None
+        self.mediamtx_process: Optional[asyncio.subprocess.Process] = None
         self.running = False
-        self.monitor_task = None
+        self._supervisors = []
+        self._drains = {}
+        self._mediamtx_cfg_path: Optional[str] = None
+        self._mediamtx_cfg_content: Optional[str] = None
+        # Resolved once; restarts reuse the absolute path
+        self.mediamtx_bin = shutil.which('mediamtx')
 
     async def start(self):
         """Start the RTSP proxy server."""
+        if self.mediamtx_bin is None:
+            logger.error("mediamtx not found - install it or use Docker")
+            raise FileNotFoundError("mediamtx not found on PATH")
+
         self.running = True
 
         # Start mediamtx RTSP server
         await self._start_mediamtx()
 
-        # Wait for mediamtx to be ready
-        await asyncio.sleep(2)
-
-        # Start FFmpeg to push stream to mediamtx
-        await self._start_ffmpeg()
-
-        # Start monitoring task
-        self.monitor_task = asyncio.create_task(self._monitor())
+        # Restart it as soon as it exits
+        self._supervisors = [
+            asyncio.create_task(self._supervise('mediamtx', 'mediamtx_process', self._start_mediamtx)),
+        ]
 
         logger.info(f"RTSP Proxy started - proxying {self.config.rtsp_url_masked}")
         logger.info(f"Stream available at: {self.config.proxy_rtsp_url}")
@@ -44,36 +68,31 @@ class RtspProxy:
         """Stop the RTSP proxy server."""
         self.running = False
 
-        if self.monitor_task:
-            self.monitor_task.cancel()
-            try:
-                await self.monitor_task
-            except asyncio.CancelledError:
-                pass
+        for task in self._supervisors:
+            task.cancel()
+        await asyncio.gather(*self._supervisors, return_exceptions=True)
+        self._supervisors = []
 
-        # Stop FFmpeg first
-        if self.ffmpeg_process:
-            self.ffmpeg_process.terminate()
-            try:
-                self.ffmpeg_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                self.ffmpeg_process.kill()
-            self.ffmpeg_process = None
-
-        # Then stop mediamtx
-        if self.mediamtx_process:
-            self.mediamtx_process.terminate()
-            try:
-                self.mediamtx_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                self.mediamtx_process.kill()
-            self.mediamtx_process = None
+        for task, _ in self._drains.values():
+            task.cancel()
+        self._drains = {}
+
+        await self._terminate(self.mediamtx_process)
+        self.mediamtx_process = None
+
+        if self._mediamtx_cfg_path:
+            with suppress(FileNotFoundError):
+                os.unlink(self._mediamtx_cfg_path)
+            self._mediamtx_cfg_path = None
+            self._mediamtx_cfg_content = None
 
         logger.info("RTSP Proxy stopped")
 
     async def _start_mediamtx(self):
         """Start mediamtx RTSP server."""
-        # Create minimal mediamtx config
+        # Create minimal mediamtx config; mediamtx pulls the source over TCP
+        # when the first client connects. The URL is JSON-quoted, which is also
+        # a valid YAML scalar, so credentials with special characters survive
         config_content = f"""
 logLevel: warn
 logDestinations: [stdout]
@@ -84,110 +103,130 @@ protocols: [tcp]
 
 paths:
   stream:
-    source: publisher
+    source: {json.dumps(self.config.rtsp_url)}
+    sourceProtocol: tcp
+    sourceOnDemand: yes
 """
-        config_path = "/tmp/mediamtx.yml"
-        with open(config_path, 'w') as f:
-            f.write(config_content)
+        config_path = self._write_mediamtx_config(config_content)
 
-        cmd = ['mediamtx', config_path]
+        cmd = [self.mediamtx_bin, config_path]
 
         logger.info(f"Starting mediamtx RTSP server on port {self.config.rtsp_proxy_port}")
 
         try:
-            self.mediamtx_process = subprocess.Popen(
-                cmd,
+            self.mediamtx_process = await asyncio.create_subprocess_exec(
+                *cmd,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setpgrp if hasattr(os, 'setpgrp') else None
+                stderr=subprocess.STDOUT,
+                start_new_session=True
             )
+            self._start_drain('mediamtx', self.mediamtx_process)
 
-            await asyncio.sleep(1)
+            ready = await self._wait_ready(self.mediamtx_process, self.config.rtsp_proxy_port)
 
-            if self.mediamtx_process.poll() is not None:
-                stderr = self.mediamtx_process.stderr.read().decode('utf-8', errors='ignore')
-                logger.error(f"mediamtx failed to start: {stderr[:500]}")
+            if self.mediamtx_process.returncode is not None:
+                output = await self._output_tail('mediamtx')
+                logger.error(f"mediamtx failed to start: {output[-500:]}")
                 raise RuntimeError("mediamtx failed to start")
 
-            logger.info("mediamtx RTSP server started")
+            if ready:
+                logger.info("mediamtx RTSP server started")
+            else:
+                logger.warning(f"mediamtx not accepting connections on port {self.config.rtsp_proxy_port} after {READY_TIMEOUT}s")
 
         except FileNotFoundError:
             logger.error("mediamtx not found - install it or use Docker")
             raise
 
-    async def _start_ffmpeg(self):
-        """Start FFmpeg to push stream to mediamtx."""
-        cmd = [
-            'ffmpeg',
-            '-hide_banner',
-            '-loglevel', 'warning',
-
-            # Input options
-            '-rtsp_transport', 'tcp',
-            '-i', self.config.rtsp_url,
-
-            # Re-encoding options (passthrough for lowest latency)
-            '-c:v', 'copy',
-            '-c:a', 'copy',
-            '-an',  # Disable audio for simplicity
-
-            # Output to mediamtx
-            '-f', 'rtsp',
-            '-rtsp_transport', 'tcp',
-            f'rtsp://127.0.0.1:{self.config.rtsp_proxy_port}/stream'
-        ]
-
-        logger.info(f"Starting FFmpeg: {' '.join(cmd[:8])}...")
+    async def _wait_ready(self, process: asyncio.subprocess.Process, port: int) -> bool:
+        """Wait until the process accepts TCP connections on the port, or exits."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + READY_TIMEOUT
 
-        try:
-            self.ffmpeg_process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setpgrp if hasattr(os, 'setpgrp') else None
-            )
-
-            await asyncio.sleep(2)
-
-            if self.ffmpeg_process.poll() is not None:
-                stderr = self.ffmpeg_process.stderr.read().decode('utf-8', errors='ignore')
-                logger.error(f"FFmpeg failed: {stderr[:500]}")
-            else:
-                logger.info("FFmpeg stream relay started")
-
-        except FileNotFoundError:
-            logger.error("FFmpeg not found")
-            raise
-        except Exception as e:
-            logger.error(f"Error starting FFmpeg: {e}")
-            raise
-
-    async def _monitor(self):
-        """Monitor FFmpeg process and restart if needed."""
-        restart_delay = 5
+        while process.returncode is None and loop.time() < deadline:
+            try:
+                _, writer = await asyncio.open_connection('127.0.0.1', port)
+            except OSError:
+                await asyncio.sleep(READY_POLL_INTERVAL)
+                continue
+            writer.close()
+            await writer.wait_closed()
+            return True
+        return False
+
+    def _write_mediamtx_config(self, content: str) -> str:
+        """Write the mediamtx config to this instance's private temp file, skipping unchanged rewrites."""
+        if self._mediamtx_cfg_path is None:
+            # Created with 0600 permissions; the config holds the source credentials
+            with tempfile.NamedTemporaryFile(mode='w', prefix='mediamtx-', suffix='.yml', delete=False) as f:
+                f.write(content)
+            self._mediamtx_cfg_path = f.name
+        elif content != self._mediamtx_cfg_content:
+            with open(self._mediamtx_cfg_path, 'w') as f:
+                f.write(content)
+        self._mediamtx_cfg_content = content
+        return self._mediamtx_cfg_path
+
+    async def _supervise(self, name: str, attr: str, start: Callable[[], Awaitable[None]]):
+        """Wait for a subprocess to exit and restart it, backing off on repeated failures."""
+        loop = asyncio.get_running_loop()
+        restart_delay = RESTART_DELAY_MIN
 
         while self.running:
-            await asyncio.sleep(10)
-
-            # Check mediamtx
-            if self.mediamtx_process and self.mediamtx_process.poll() is not None:
-                logger.error("mediamtx died, restarting...")
-                await self._start_mediamtx()
-                await asyncio.sleep(2)
-
-            # Check FFmpeg
-            if self.ffmpeg_process and self.ffmpeg_process.poll() is not None:
-                logger.warning(f"FFmpeg process died (code: {self.ffmpeg_process.returncode}), restarting...")
-
-                if self.ffmpeg_process.stderr:
-                    stderr = self.ffmpeg_process.stderr.read()
-                    if stderr:
-                        logger.error(f"FFmpeg stderr: {stderr.decode('utf-8', errors='ignore')[:500]}")
-
-                await asyncio.sleep(restart_delay)
-
-                if self.running:
-                    await self._start_ffmpeg()
-                    restart_delay = min(restart_delay * 2, 60)
-            else:
-                restart_delay = 5
+            process = getattr(self, attr)
+            started = loop.time()
+            returncode = await process.wait()
+            if not self.running:
+                break
+
+            if loop.time() - started >= RESTART_DELAY_MAX:
+                restart_delay = RESTART_DELAY_MIN
+
+            logger.warning(f"{name} process died (code: {returncode}), restarting in {restart_delay}s...")
+            output = await self._output_tail(name)
+            if output:
+                logger.error(f"{name} output: {output[-500:]}")
+
+            await asyncio.sleep(restart_delay)
+            restart_delay = min(restart_delay * 2, RESTART_DELAY_MAX)
+
+            if self.running:
+                try:
+                    await start()
+                except Exception as e:
+                    # The dead process stays in place, so the next wait() returns at once
+                    logger.error(f"Error restarting {name}: {e}")
+
+    def _start_drain(self, name: str, process: asyncio.subprocess.Process):
+        """Start reading a subprocess's combined stdout/stderr in the background."""
+        tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        task = asyncio.create_task(self._drain(name, process.stdout, tail))
+        self._drains[name] = (task, tail)
+
+    async def _drain(self, name: str, stream: asyncio.StreamReader, tail: deque):
+        """Log subprocess output line by line until it closes."""
+        async for line in stream:
+            text = line.decode('utf-8', errors='ignore').rstrip()
+            tail.append(text)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"{name}: {text}")
+
+    async def _output_tail(self, name: str) -> str:
+        """Return the last lines a subprocess printed, once its output has closed."""
+        task, tail = self._drains[name]
+        # A leftover child can keep the pipe open; don't wait on it forever
+        await asyncio.wait([task], timeout=1)
+        return '\n'.join(tail)
+
+    async def _terminate(self, process: Optional[asyncio.subprocess.Process]):
+        """Terminate a subprocess, killing it if it does not exit in time."""
+        if process is None or process.returncode is not None:
+            return
+        try:
+            process.terminate()
+            await asyncio.wait_for(process.wait(), timeout=STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+        except ProcessLookupError:
+            pass
@@ -1,70 +1,71 @@
 """ONVIF Device Service implementation."""
 
 import logging
-from datetime import datetime, timezone
-from lxml import etree
+import time
+from dataclasses import dataclass
+from typing import Optional
 
 from src.config import Config
-from src.utils.soap_utils import SoapHandler
+from src.utils.soap_utils import SoapHandler, compact_xml
 
 logger = logging.getLogger(__name__)
 
+# Actions whose response changes between requests and is built per call
+DYNAMIC_ACTIONS = frozenset({'GetSystemDateAndTime'})
 
-class DeviceService:
-    """ONVIF Device Service for Profile S."""
-    
-    def __init__(self, config: Config, soap_handler: SoapHandler):
-        self.config = config
-        self.soap = soap_handler
-        
-        # Map of actions to handlers
-        self.actions = {
-            'GetDeviceInformation': self._get_device_information,
-            'GetCapabilities': self._get_capabilities,
-            'GetServices': self._get_services,
-            'GetServiceCapabilities': self._get_service_capabilities,
-            'GetSystemDateAndTime': self._get_system_date_time,
-            'GetScopes': self._get_scopes,
-            'GetHostname': self._get_hostname,
-            'GetNetworkInterfaces': self._get_network_interfaces,
-            'GetDNS': self._get_dns,
-            'GetNTP': self._get_ntp,
-            'GetUsers': self._get_users,
-            'GetWsdlUrl': self._get_wsdl_url,
-        }
-        
-    async def handle_request(self, body: bytes) -> bytes:
-        """Handle incoming SOAP request."""
-        action = self.soap.get_action(body)
-        logger.info(f"Device Service action: {action}")
-        
-        handler = self.actions.get(action)
-        if handler:
-            return handler(body)
-        else:
-            logger.warning(f"Unknown action: {action}")
-            return self.soap.create_fault("ActionNotSupported", f"Action {action} not supported")
-            
-    def _get_device_information(self, body: bytes) -> bytes:
-        """Handle GetDeviceInformation request."""
-        response = f'''
-        <tds:GetDeviceInformationResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
-            <tds:Manufacturer>{self.config.camera_manufacturer}</tds:Manufacturer>
-            <tds:Model>{self.config.camera_model}</tds:Model>
-            <tds:FirmwareVersion>{self.config.camera_firmware}</tds:FirmwareVersion>
-            <tds:SerialNumber>{self.config.camera_serial}</tds:SerialNumber>
-            <tds:HardwareId>{self.config.hardware_id}</tds:HardwareId>
-        </tds:GetDeviceInformationResponse>
-        '''
-        return self.soap.wrap_response(response)
-        
-    def _get_capabilities(self, body: bytes) -> bytes:
-        """Handle GetCapabilities request."""
-        response = f'''
-        <tds:GetCapabilitiesResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
+# GetSystemDateAndTime response, split around its time fields; the UTC and
+# local date/time blocks are identical since the device runs on UTC
+SYSTEM_DATE_TIME_HEAD = compact_xml(b'''<tds:GetSystemDateAndTimeResponse>
+            <tds:SystemDateAndTime>
+                <tt:DateTimeType>NTP</tt:DateTimeType>
+                <tt:DaylightSavings>false</tt:DaylightSavings>
+                <tt:TimeZone>
+                    <tt:TZ>UTC0</tt:TZ>
+                </tt:TimeZone>
+                <tt:UTCDateTime>''')
+SYSTEM_DATE_TIME_MIDDLE = compact_xml(b'''
+                </tt:UTCDateTime>
+                <tt:LocalDateTime>''')
+SYSTEM_DATE_TIME_TAIL = compact_xml(b'''
+                </tt:LocalDateTime>
+            </tds:SystemDateAndTime>
+        </tds:GetSystemDateAndTimeResponse>''')
+
+# Date/time block fragments around hour, minute, second, year, month and day
+DATE_TIME_PARTS = tuple(compact_xml(part) for part in (
+    b'''
+                    <tt:Time>
+                        <tt:Hour>''',
+    b'''</tt:Hour>
+                        <tt:Minute>''',
+    b'''</tt:Minute>
+                        <tt:Second>''',
+    b'''</tt:Second>
+                    </tt:Time>
+                    <tt:Date>
+                        <tt:Year>''',
+    b'''</tt:Year>
+                        <tt:Month>''',
+    b'''</tt:Month>
+                        <tt:Day>''',
+    b'''</tt:Day>
+                    </tt:Date>''',
+))
+
+
+# Static response bodies, with %b slots for config values
+DEVICE_INFORMATION_RESPONSE = compact_xml(b'''<tds:GetDeviceInformationResponse>
+            <tds:Manufacturer>%b</tds:Manufacturer>
+            <tds:Model>%b</tds:Model>
+            <tds:FirmwareVersion>%b</tds:FirmwareVersion>
+            <tds:SerialNumber>%b</tds:SerialNumber>
+            <tds:HardwareId>%b</tds:HardwareId>
+        </tds:GetDeviceInformationResponse>''')
+
+CAPABILITIES_RESPONSE = compact_xml(b'''<tds:GetCapabilitiesResponse>
             <tds:Capabilities>
-                <tt:Device xmlns:tt="http://www.onvif.org/ver10/schema">
-                    <tt:XAddr>{self.config.device_service_url}</tt:XAddr>
+                <tt:Device>
+                    <tt:XAddr>%b</tt:XAddr>
                     <tt:Network>
                         <tt:IPFilter>false</tt:IPFilter>
                         <tt:ZeroConfiguration>false</tt:ZeroConfiguration>
@@ -98,61 +99,51 @@ class DeviceService:
                         <tt:RELToken>false</tt:RELToken>
                     </tt:Security>
                 </tt:Device>
-                <tt:Media xmlns:tt="http://www.onvif.org/ver10/schema">
-                    <tt:XAddr>{self.config.media_service_url}</tt:XAddr>
+                <tt:Media>
+                    <tt:XAddr>%b</tt:XAddr>
                     <tt:StreamingCapabilities>
                         <tt:RTPMulticast>false</tt:RTPMulticast>
                         <tt:RTP_TCP>true</tt:RTP_TCP>
                         <tt:RTP_RTSP_TCP>true</tt:RTP_RTSP_TCP>
                     </tt:StreamingCapabilities>
                 </tt:Media>
-                <tt:Events xmlns:tt="http://www.onvif.org/ver10/schema">
-                    <tt:XAddr>{self.config.events_service_url}</tt:XAddr>
+                <tt:Events>
+                    <tt:XAddr>%b</tt:XAddr>
                     <tt:WSSubscriptionPolicySupport>false</tt:WSSubscriptionPolicySupport>
                     <tt:WSPullPointSupport>true</tt:WSPullPointSupport>
                     <tt:WSPausableSubscriptionManagerInterfaceSupport>false</tt:WSPausableSubscriptionManagerInterfaceSupport>
                 </tt:Events>
             </tds:Capabilities>
-        </tds:GetCapabilitiesResponse>
-        '''
-        return self.soap.wrap_response(response)
-        
-    def _get_services(self, body: bytes) -> bytes:
-        """Handle GetServices request."""
-        response = f'''
-        <tds:GetServicesResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
+        </tds:GetCapabilitiesResponse>''')
+
+SERVICES_RESPONSE = compact_xml(b'''<tds:GetServicesResponse>
             <tds:Service>
                 <tds:Namespace>http://www.onvif.org/ver10/device/wsdl</tds:Namespace>
-                <tds:XAddr>{self.config.device_service_url}</tds:XAddr>
+                <tds:XAddr>%b</tds:XAddr>
                 <tds:Version>
-                    <tt:Major xmlns:tt="http://www.onvif.org/ver10/schema">2</tt:Major>
-                    <tt:Minor xmlns:tt="http://www.onvif.org/ver10/schema">0</tt:Minor>
+                    <tt:Major>2</tt:Major>
+                    <tt:Minor>0</tt:Minor>
                 </tds:Version>
             </tds:Service>
             <tds:Service>
                 <tds:Namespace>http://www.onvif.org/ver10/media/wsdl</tds:Namespace>
-                <tds:XAddr>{self.config.media_service_url}</tds:XAddr>
+                <tds:XAddr>%b</tds:XAddr>
                 <tds:Version>
-                    <tt:Major xmlns:tt="http://www.onvif.org/ver10/schema">2</tt:Major>
-                    <tt:Minor xmlns:tt="http://www.onvif.org/ver10/schema">0</tt:Minor>
+                    <tt:Major>2</tt:Major>
+                    <tt:Minor>0</tt:Minor>
                 </tds:Version>
             </tds:Service>
             <tds:Service>
                 <tds:Namespace>http://www.onvif.org/ver10/events/wsdl</tds:Namespace>
-                <tds:XAddr>{self.config.events_service_url}</tds:XAddr>
+                <tds:XAddr>%b</tds:XAddr>
                 <tds:Version>
-                    <tt:Major xmlns:tt="http://www.onvif.org/ver10/schema">2</tt:Major>
-                    <tt:Minor xmlns:tt="http://www.onvif.org/ver10/schema">0</tt:Minor>
+                    <tt:Major>2</tt:Major>
+                    <tt:Minor>0</tt:Minor>
                 </tds:Version>
             </tds:Service>
-        </tds:GetServicesResponse>
-        '''
-        return self.soap.wrap_response(response)
-        
-    def _get_service_capabilities(self, body: bytes) -> bytes:
-        """Handle GetServiceCapabilities request."""
-        response = '''
-        <tds:GetServiceCapabilitiesResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
+        </tds:GetServicesResponse>''')
+
+SERVICE_CAPABILITIES_RESPONSE = compact_xml(b'''<tds:GetServiceCapabilitiesResponse>
             <tds:Capabilities>
                 <tds:Network DHCPv6="false" NTP="0" HostnameFromDHCP="false" Dot11Configuration="false" 
                     Dot1XConfigurations="0" DynDNS="false" IPVersion6="false" ZeroConfiguration="false" IPFilter="false"/>
@@ -164,159 +155,242 @@ class DeviceService:
                     SystemBackup="false" SystemLogging="false" FirmwareUpgrade="false" HttpFirmwareUpgrade="false" 
                     HttpSystemBackup="false" HttpSystemLogging="false" HttpSupportInformation="false"/>
             </tds:Capabilities>
-        </tds:GetServiceCapabilitiesResponse>
-        '''
-        return self.soap.wrap_response(response)
-        
-    def _get_system_date_time(self, body: bytes) -> bytes:
-        """Handle GetSystemDateAndTime request."""
-        now = datetime.now(timezone.utc)
-        response = f'''
-        <tds:GetSystemDateAndTimeResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
-            <tds:SystemDateAndTime>
-                <tt:DateTimeType xmlns:tt="http://www.onvif.org/ver10/schema">NTP</tt:DateTimeType>
-                <tt:DaylightSavings xmlns:tt="http://www.onvif.org/ver10/schema">false</tt:DaylightSavings>
-                <tt:TimeZone xmlns:tt="http://www.onvif.org/ver10/schema">
-                    <tt:TZ>UTC0</tt:TZ>
-                </tt:TimeZone>
-                <tt:UTCDateTime xmlns:tt="http://www.onvif.org/ver10/schema">
-                    <tt:Time>
-                        <tt:Hour>{now.hour}</tt:Hour>
-                        <tt:Minute>{now.minute}</tt:Minute>
-                        <tt:Second>{now.second}</tt:Second>
-                    </tt:Time>
-                    <tt:Date>
-                        <tt:Year>{now.year}</tt:Year>
-                        <tt:Month>{now.month}</tt:Month>
-                        <tt:Day>{now.day}</tt:Day>
-                    </tt:Date>
-                </tt:UTCDateTime>
-                <tt:LocalDateTime xmlns:tt="http://www.onvif.org/ver10/schema">
-                    <tt:Time>
-                        <tt:Hour>{now.hour}</tt:Hour>
-                        <tt:Minute>{now.minute}</tt:Minute>
-                        <tt:Second>{now.second}</tt:Second>
-                    </tt:Time>
-                    <tt:Date>
-                        <tt:Year>{now.year}</tt:Year>
-                        <tt:Month>{now.month}</tt:Month>
-                        <tt:Day>{now.day}</tt:Day>
-                    </tt:Date>
-                </tt:LocalDateTime>
-            </tds:SystemDateAndTime>
-        </tds:GetSystemDateAndTimeResponse>
-        '''
-        return self.soap.wrap_response(response)
-        
-    def _get_scopes(self, body: bytes) -> bytes:
-        """Handle GetScopes request."""
-        response = f'''
-        <tds:GetScopesResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
-            <tds:Scopes>
-                <tt:ScopeDef xmlns:tt="http://www.onvif.org/ver10/schema">Fixed</tt:ScopeDef>
-                <tt:ScopeItem xmlns:tt="http://www.onvif.org/ver10/schema">onvif://www.onvif.org/type/video_encoder</tt:ScopeItem>
-            </tds:Scopes>
-            <tds:Scopes>
-                <tt:ScopeDef xmlns:tt="http://www.onvif.org/ver10/schema">Fixed</tt:ScopeDef>
-                <tt:ScopeItem xmlns:tt="http://www.onvif.org/ver10/schema">onvif://www.onvif.org/type/Network_Video_Transmitter</tt:ScopeItem>
-            </tds:Scopes>
-            <tds:Scopes>
-                <tt:ScopeDef xmlns:tt="http://www.onvif.org/ver10/schema">Fixed</tt:ScopeDef>
-                <tt:ScopeItem xmlns:tt="http://www.onvif.org/ver10/schema">onvif://www.onvif.org/Profile/Streaming</tt:ScopeItem>
-            </tds:Scopes>
-            <tds:Scopes>
-                <tt:ScopeDef xmlns:tt="http://www.onvif.org/ver10/schema">Fixed</tt:ScopeDef>
-                <tt:ScopeItem xmlns:tt="http://www.onvif.org/ver10/schema">onvif://www.onvif.org/hardware/{self.config.camera_model}</tt:ScopeItem>
-            </tds:Scopes>
-            <tds:Scopes>
-                <tt:ScopeDef xmlns:tt="http://www.onvif.org/ver10/schema">Configurable</tt:ScopeDef>
-                <tt:ScopeItem xmlns:tt="http://www.onvif.org/ver10/schema">onvif://www.onvif.org/name/{self.config.camera_name.replace(' ', '_')}</tt:ScopeItem>
-            </tds:Scopes>
-            <tds:Scopes>
-                <tt:ScopeDef xmlns:tt="http://www.onvif.org/ver10/schema">Configurable</tt:ScopeDef>
-                <tt:ScopeItem xmlns:tt="http://www.onvif.org/ver10/schema">onvif://www.onvif.org/location/</tt:ScopeItem>
-            </tds:Scopes>
-        </tds:GetScopesResponse>
-        '''
-        return self.soap.wrap_response(response)
-        
-    def _get_hostname(self, body: bytes) -> bytes:
-        """Handle GetHostname request."""
-        response = f'''
-        <tds:GetHostnameResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
+        </tds:GetServiceCapabilitiesResponse>''')
+
+SCOPES_RESPONSE = b'<tds:GetScopesResponse>%b</tds:GetScopesResponse>'
+
+# One Scopes entry, with slots for the scope definition and item
+SCOPE_ENTRY = compact_xml(b'''<tds:Scopes>
+                <tt:ScopeDef>%b</tt:ScopeDef>
+                <tt:ScopeItem>%b</tt:ScopeItem>
+            </tds:Scopes>''')
+
+# Scopes that do not depend on config, as (definition, item) pairs
+FIXED_SCOPES = (
+    (b'Fixed', b'onvif://www.onvif.org/type/video_encoder'),
+    (b'Fixed', b'onvif://www.onvif.org/type/Network_Video_Transmitter'),
+    (b'Fixed', b'onvif://www.onvif.org/Profile/Streaming'),
+)
+
+HOSTNAME_RESPONSE = compact_xml(b'''<tds:GetHostnameResponse>
             <tds:HostnameInformation>
-                <tt:FromDHCP xmlns:tt="http://www.onvif.org/ver10/schema">false</tt:FromDHCP>
-                <tt:Name xmlns:tt="http://www.onvif.org/ver10/schema">onvif-bridge</tt:Name>
+                <tt:FromDHCP>false</tt:FromDHCP>
+                <tt:Name>onvif-bridge</tt:Name>
             </tds:HostnameInformation>
-        </tds:GetHostnameResponse>
-        '''
-        return self.soap.wrap_response(response)
-        
-    def _get_network_interfaces(self, body: bytes) -> bytes:
-        """Handle GetNetworkInterfaces request."""
-        response = f'''
-        <tds:GetNetworkInterfacesResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
+        </tds:GetHostnameResponse>''')
+
+NETWORK_INTERFACES_RESPONSE = compact_xml(b'''<tds:GetNetworkInterfacesResponse>
             <tds:NetworkInterfaces token="eth0">
-                <tt:Enabled xmlns:tt="http://www.onvif.org/ver10/schema">true</tt:Enabled>
-                <tt:Info xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:Enabled>true</tt:Enabled>
+                <tt:Info>
                     <tt:Name>eth0</tt:Name>
                     <tt:HwAddress>00:00:00:00:00:00</tt:HwAddress>
                     <tt:MTU>1500</tt:MTU>
                 </tt:Info>
-                <tt:IPv4 xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:IPv4>
                     <tt:Enabled>true</tt:Enabled>
                     <tt:Config>
                         <tt:Manual>
-                            <tt:Address>{self.config.server_ip}</tt:Address>
+                            <tt:Address>%b</tt:Address>
                             <tt:PrefixLength>24</tt:PrefixLength>
                         </tt:Manual>
                         <tt:DHCP>false</tt:DHCP>
                     </tt:Config>
                 </tt:IPv4>
             </tds:NetworkInterfaces>
-        </tds:GetNetworkInterfacesResponse>
-        '''
-        return self.soap.wrap_response(response)
+        </tds:GetNetworkInterfacesResponse>''')
+
+DNS_RESPONSE = compact_xml(b'''<tds:GetDNSResponse>
+            <tds:DNSInformation>
+                <tt:FromDHCP>false</tt:FromDHCP>
+            </tds:DNSInformation>
+        </tds:GetDNSResponse>''')
+
+NTP_RESPONSE = compact_xml(b'''<tds:GetNTPResponse>
+            <tds:NTPInformation>
+                <tt:FromDHCP>false</tt:FromDHCP>
+            </tds:NTPInformation>
+        </tds:GetNTPResponse>''')
+
+USERS_RESPONSE = compact_xml(b'''<tds:GetUsersResponse>
+            <tds:User>
+                <tt:Username>%b</tt:Username>
+                <tt:UserLevel>Administrator</tt:UserLevel>
+            </tds:User>
+        </tds:GetUsersResponse>''')
+
+WSDL_URL_RESPONSE = compact_xml(b'''<tds:GetWsdlUrlResponse>
+            <tds:WsdlUrl>%b?wsdl</tds:WsdlUrl>
+        </tds:GetWsdlUrlResponse>''')
+
+
+@dataclass(slots=True)
+class ConfigBytes:
+    """Config values used in Device responses, encoded once."""
+    manufacturer: bytes
+    model: bytes
+    firmware: bytes
+    serial: bytes
+    hardware_id: bytes
+    device_url: bytes
+    media_url: bytes
+    events_url: bytes
+    ip: bytes
+    name_scope: bytes
+    username: bytes
+    
+    @classmethod
+    def from_config(cls, config: Config) -> 'ConfigBytes':
+        """Encode the values from the application config."""
+        return cls(
+            manufacturer=config.camera_manufacturer.encode('utf-8'),
+            model=config.camera_model.encode('utf-8'),
+            firmware=config.camera_firmware.encode('utf-8'),
+            serial=config.camera_serial.encode('utf-8'),
+            hardware_id=config.hardware_id.encode('utf-8'),
+            device_url=config.device_service_url.encode('utf-8'),
+            media_url=config.media_service_url.encode('utf-8'),
+            events_url=config.events_service_url.encode('utf-8'),
+            ip=config.server_ip.encode('utf-8'),
+            # Scope items are URIs, so spaces in the name are replaced
+            name_scope=config.camera_name.replace(' ', '_').encode('utf-8'),
+            username=config.onvif_username.encode('utf-8'),
+        )
+
+
+class DeviceService:
+    """ONVIF Device Service for Profile S."""
+    
+    __slots__ = ('config', 'soap', '_cb', '_dt_cache_ts', '_dt_cache_bytes', 'actions', '_dispatch')
+    
+    def __init__(self, config: Config, soap_handler: SoapHandler):
+        self.config = config
+        self.soap = soap_handler
+        self._cb = ConfigBytes.from_config(config)
+        
+        # GetSystemDateAndTime only changes once a second; keep the last
+        # response with the second it was built for
+        self._dt_cache_ts = 0
+        self._dt_cache_bytes = b''
+        
+        # Map of actions to handlers
+        self.actions = {
+            'GetDeviceInformation': self._get_device_information,
+            'GetCapabilities': self._get_capabilities,
+            'GetServices': self._get_services,
+            'GetServiceCapabilities': self._get_service_capabilities,
+            'GetSystemDateAndTime': self._get_system_date_time,
+            'GetScopes': self._get_scopes,
+            'GetHostname': self._get_hostname,
+            'GetNetworkInterfaces': self._get_network_interfaces,
+            'GetDNS': self._get_dns,
+            'GetNTP': self._get_ntp,
+            'GetUsers': self._get_users,
+            'GetWsdlUrl': self._get_wsdl_url,
+        }
+        
+        # Everything except the current time only depends on config, which is
+        # fixed for the process lifetime, so those responses are rendered and
+        # wrapped once up front. The dispatch table maps each action to either
+        # its cached bytes or, for dynamic actions, its handler
+        self._dispatch = {
+            action: handler if action in DYNAMIC_ACTIONS else handler(b'')
+            for action, handler in self.actions.items()
+        }
+        
+    def handle_request(self, body: bytes, soap_action: Optional[str] = None) -> bytes:
+        """Handle incoming SOAP request."""
+        action = self.soap.get_action(body, soap_action)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Device Service action: %s", action)
+        
+        response = self._dispatch.get(action)
+        if response is None:
+            logger.warning("Unknown action: %s", action)
+            return self.soap.create_fault("ActionNotSupported", f"Action {action} not supported")
+        return response if isinstance(response, bytes) else response(body)
+            
+    def _get_device_information(self, body: bytes) -> bytes:
+        """Handle GetDeviceInformation request."""
+        return self.soap.wrap_response_bytes(DEVICE_INFORMATION_RESPONSE % (
+            self._cb.manufacturer,
+            self._cb.model,
+            self._cb.firmware,
+            self._cb.serial,
+            self._cb.hardware_id,
+        ))
+        
+    def _get_capabilities(self, body: bytes) -> bytes:
+        """Handle GetCapabilities request."""
+        return self.soap.wrap_response_bytes(CAPABILITIES_RESPONSE % (
+            self._cb.device_url,
+            self._cb.media_url,
+            self._cb.events_url,
+        ))
+        
+    def _get_services(self, body: bytes) -> bytes:
+        """Handle GetServices request."""
+        return self.soap.wrap_response_bytes(SERVICES_RESPONSE % (
+            self._cb.device_url,
+            self._cb.media_url,
+            self._cb.events_url,
+        ))
+        
+    def _get_service_capabilities(self, body: bytes) -> bytes:
+        """Handle GetServiceCapabilities request."""
+        return self.soap.wrap_response_bytes(SERVICE_CAPABILITIES_RESPONSE)
+        
+    def _get_system_date_time(self, body: bytes) -> bytes:
+        """Handle GetSystemDateAndTime request, cached per second."""
+        now_s = int(time.time())
+        if now_s == self._dt_cache_ts:
+            return self._dt_cache_bytes
+        now = time.gmtime(now_s)
+        fields = (now.tm_hour, now.tm_min, now.tm_sec, now.tm_year, now.tm_mon, now.tm_mday)
+        # Interleave the constant fragments with the encoded time fields
+        parts = [DATE_TIME_PARTS[0]]
+        for value, fragment in zip(fields, DATE_TIME_PARTS[1:]):
+            parts.append(str(value).encode('ascii'))
+            parts.append(fragment)
+        date_time = b''.join(parts)
+        
+        response = b''.join((
+            SYSTEM_DATE_TIME_HEAD, date_time, SYSTEM_DATE_TIME_MIDDLE, date_time, SYSTEM_DATE_TIME_TAIL
+        ))
+        self._dt_cache_bytes = self.soap.wrap_response_bytes(response)
+        self._dt_cache_ts = now_s
+        return self._dt_cache_bytes
+        
+    def _get_scopes(self, body: bytes) -> bytes:
+        """Handle GetScopes request."""
+        scopes = FIXED_SCOPES + (
+            (b'Fixed', b'onvif://www.onvif.org/hardware/' + self._cb.model),
+            (b'Configurable', b'onvif://www.onvif.org/name/' + self._cb.name_scope),
+            (b'Configurable', b'onvif://www.onvif.org/location/'),
+        )
+        entries = b''.join([SCOPE_ENTRY % scope for scope in scopes])
+        return self.soap.wrap_response_bytes(SCOPES_RESPONSE % entries)
+        
+    def _get_hostname(self, body: bytes) -> bytes:
+        """Handle GetHostname request."""
+        return self.soap.wrap_response_bytes(HOSTNAME_RESPONSE)
+        
+    def _get_network_interfaces(self, body: bytes) -> bytes:
+        """Handle GetNetworkInterfaces request."""
+        return self.soap.wrap_response_bytes(NETWORK_INTERFACES_RESPONSE % self._cb.ip)
         
     def _get_dns(self, body: bytes) -> bytes:
         """Handle GetDNS request."""
-        response = '''
-        <tds:GetDNSResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
-            <tds:DNSInformation>
-                <tt:FromDHCP xmlns:tt="http://www.onvif.org/ver10/schema">false</tt:FromDHCP>
-            </tds:DNSInformation>
-        </tds:GetDNSResponse>
-        '''
-        return self.soap.wrap_response(response)
+        return self.soap.wrap_response_bytes(DNS_RESPONSE)
         
     def _get_ntp(self, body: bytes) -> bytes:
         """Handle GetNTP request."""
-        response = '''
-        <tds:GetNTPResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
-            <tds:NTPInformation>
-                <tt:FromDHCP xmlns:tt="http://www.onvif.org/ver10/schema">false</tt:FromDHCP>
-            </tds:NTPInformation>
-        </tds:GetNTPResponse>
-        '''
-        return self.soap.wrap_response(response)
+        return self.soap.wrap_response_bytes(NTP_RESPONSE)
         
     def _get_users(self, body: bytes) -> bytes:
         """Handle GetUsers request."""
-        response = f'''
-        <tds:GetUsersResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
-            <tds:User>
-                <tt:Username xmlns:tt="http://www.onvif.org/ver10/schema">{self.config.onvif_username}</tt:Username>
-                <tt:UserLevel xmlns:tt="http://www.onvif.org/ver10/schema">Administrator</tt:UserLevel>
-            </tds:User>
-        </tds:GetUsersResponse>
-        '''
-        return self.soap.wrap_response(response)
+        return self.soap.wrap_response_bytes(USERS_RESPONSE % self._cb.username)
         
     def _get_wsdl_url(self, body: bytes) -> bytes:
         """Handle GetWsdlUrl request."""
-        response = f'''
-        <tds:GetWsdlUrlResponse xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
-            <tds:WsdlUrl>{self.config.device_service_url}?wsdl</tds:WsdlUrl>
-        </tds:GetWsdlUrlResponse>
-        '''
-        return self.soap.wrap_response(response)
+        return self.soap.wrap_response_bytes(WSDL_URL_RESPONSE % self._cb.device_url)
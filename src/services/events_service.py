@@ -1,59 +1,33 @@
 """ONVIF Events Service implementation."""
 
 import logging
+import time
 from datetime import datetime, timezone, timedelta
-from lxml import etree
+from typing import Optional
 
 from src.config import Config
 from src.utils.soap_utils import SoapHandler
 
 logger = logging.getLogger(__name__)
 
+# How long subscriptions are reported to last
+SUBSCRIPTION_DURATION = timedelta(hours=1)
 
-class EventsService:
-    """ONVIF Events Service for Profile S."""
-    
-    def __init__(self, config: Config, soap_handler: SoapHandler):
-        self.config = config
-        self.soap = soap_handler
-        
-        # Map of actions to handlers
-        self.actions = {
-            'GetServiceCapabilities': self._get_service_capabilities,
-            'GetEventProperties': self._get_event_properties,
-            'CreatePullPointSubscription': self._create_pull_point_subscription,
-            'PullMessages': self._pull_messages,
-            'Unsubscribe': self._unsubscribe,
-            'Renew': self._renew,
-            'Subscribe': self._subscribe,
-        }
-        
-    async def handle_request(self, body: bytes) -> bytes:
-        """Handle incoming SOAP request."""
-        action = self.soap.get_action(body)
-        logger.info(f"Events Service action: {action}")
-        
-        handler = self.actions.get(action)
-        if handler:
-            return handler(body)
-        else:
-            logger.warning(f"Unknown action: {action}")
-            return self.soap.create_fault("ActionNotSupported", f"Action {action} not supported")
-            
-    def _get_service_capabilities(self, body: bytes) -> bytes:
-        """Handle GetServiceCapabilities request."""
-        response = '''
+# Second-granularity cache of (epoch second, current time, termination time)
+_timestamp_cache = [0, b'', b'']
+
+# Placeholder split out of the cached responses and filled with a timestamp per request
+TIME_SLOT = b'__TIME__'
+
+SERVICE_CAPABILITIES_RESPONSE = '''
         <tev:GetServiceCapabilitiesResponse xmlns:tev="http://www.onvif.org/ver10/events/wsdl">
             <tev:Capabilities WSSubscriptionPolicySupport="false" WSPullPointSupport="true" 
                 WSPausableSubscriptionManagerInterfaceSupport="false" MaxNotificationProducers="1" 
                 MaxPullPoints="2" PersistentNotificationStorage="false"/>
         </tev:GetServiceCapabilitiesResponse>
         '''
-        return self.soap.wrap_response(response)
-        
-    def _get_event_properties(self, body: bytes) -> bytes:
-        """Handle GetEventProperties request."""
-        response = '''
+
+EVENT_PROPERTIES_RESPONSE = '''
         <tev:GetEventPropertiesResponse xmlns:tev="http://www.onvif.org/ver10/events/wsdl"
             xmlns:wsnt="http://docs.oasis-open.org/wsn/b-2"
             xmlns:wstop="http://docs.oasis-open.org/wsn/t-1">
@@ -76,73 +50,140 @@ class EventsService:
             <tev:MessageContentSchemaLocation>http://www.onvif.org/onvif/ver10/schema/onvif.xsd</tev:MessageContentSchemaLocation>
         </tev:GetEventPropertiesResponse>
         '''
-        return self.soap.wrap_response(response)
-        
-    def _create_pull_point_subscription(self, body: bytes) -> bytes:
-        """Handle CreatePullPointSubscription request."""
-        now = datetime.now(timezone.utc)
-        termination = now + timedelta(hours=1)
-        
-        response = f'''
+
+CREATE_PULL_POINT_SUBSCRIPTION_RESPONSE = '''
         <tev:CreatePullPointSubscriptionResponse xmlns:tev="http://www.onvif.org/ver10/events/wsdl"
             xmlns:wsnt="http://docs.oasis-open.org/wsn/b-2"
             xmlns:wsa="http://www.w3.org/2005/08/addressing">
             <tev:SubscriptionReference>
-                <wsa:Address>{self.config.events_service_url}</wsa:Address>
+                <wsa:Address>{events_service_url}</wsa:Address>
             </tev:SubscriptionReference>
-            <wsnt:CurrentTime>{now.isoformat()}</wsnt:CurrentTime>
-            <wsnt:TerminationTime>{termination.isoformat()}</wsnt:TerminationTime>
+            <wsnt:CurrentTime>__TIME__</wsnt:CurrentTime>
+            <wsnt:TerminationTime>__TIME__</wsnt:TerminationTime>
         </tev:CreatePullPointSubscriptionResponse>
         '''
-        return self.soap.wrap_response(response)
-        
-    def _pull_messages(self, body: bytes) -> bytes:
-        """Handle PullMessages request - returns empty (no events)."""
-        now = datetime.now(timezone.utc)
-        termination = now + timedelta(hours=1)
-        
-        response = f'''
+
+PULL_MESSAGES_RESPONSE = '''
         <tev:PullMessagesResponse xmlns:tev="http://www.onvif.org/ver10/events/wsdl">
-            <tev:CurrentTime>{now.isoformat()}</tev:CurrentTime>
-            <tev:TerminationTime>{termination.isoformat()}</tev:TerminationTime>
+            <tev:CurrentTime>__TIME__</tev:CurrentTime>
+            <tev:TerminationTime>__TIME__</tev:TerminationTime>
         </tev:PullMessagesResponse>
         '''
-        return self.soap.wrap_response(response)
-        
-    def _unsubscribe(self, body: bytes) -> bytes:
-        """Handle Unsubscribe request."""
-        response = '''
+
+UNSUBSCRIBE_RESPONSE = '''
         <wsnt:UnsubscribeResponse xmlns:wsnt="http://docs.oasis-open.org/wsn/b-2">
         </wsnt:UnsubscribeResponse>
         '''
-        return self.soap.wrap_response(response)
-        
-    def _renew(self, body: bytes) -> bytes:
-        """Handle Renew request."""
-        now = datetime.now(timezone.utc)
-        termination = now + timedelta(hours=1)
-        
-        response = f'''
+
+RENEW_RESPONSE = '''
         <wsnt:RenewResponse xmlns:wsnt="http://docs.oasis-open.org/wsn/b-2">
-            <wsnt:TerminationTime>{termination.isoformat()}</wsnt:TerminationTime>
-            <wsnt:CurrentTime>{now.isoformat()}</wsnt:CurrentTime>
+            <wsnt:TerminationTime>__TIME__</wsnt:TerminationTime>
+            <wsnt:CurrentTime>__TIME__</wsnt:CurrentTime>
         </wsnt:RenewResponse>
         '''
-        return self.soap.wrap_response(response)
-        
-    def _subscribe(self, body: bytes) -> bytes:
-        """Handle Subscribe request."""
-        now = datetime.now(timezone.utc)
-        termination = now + timedelta(hours=1)
-        
-        response = f'''
+
+SUBSCRIBE_RESPONSE = '''
         <wsnt:SubscribeResponse xmlns:wsnt="http://docs.oasis-open.org/wsn/b-2"
             xmlns:wsa="http://www.w3.org/2005/08/addressing">
             <wsnt:SubscriptionReference>
-                <wsa:Address>{self.config.events_service_url}</wsa:Address>
+                <wsa:Address>{events_service_url}</wsa:Address>
             </wsnt:SubscriptionReference>
-            <wsnt:CurrentTime>{now.isoformat()}</wsnt:CurrentTime>
-            <wsnt:TerminationTime>{termination.isoformat()}</wsnt:TerminationTime>
+            <wsnt:CurrentTime>__TIME__</wsnt:CurrentTime>
+            <wsnt:TerminationTime>__TIME__</wsnt:TerminationTime>
         </wsnt:SubscribeResponse>
         '''
-        return self.soap.wrap_response(response)
+
+
+def _timestamps() -> tuple:
+    """Return the current and termination times as ISO 8601 bytes, cached per second."""
+    now_s = int(time.time())
+    if now_s != _timestamp_cache[0]:
+        now = datetime.fromtimestamp(now_s, timezone.utc)
+        termination = now + SUBSCRIPTION_DURATION
+        _timestamp_cache[:] = [now_s, now.isoformat().encode(), termination.isoformat().encode()]
+    return _timestamp_cache[1], _timestamp_cache[2]
+
+
+class EventsService:
+    """ONVIF Events Service for Profile S."""
+    
+    def __init__(self, config: Config, soap_handler: SoapHandler):
+        self.config = config
+        self.soap = soap_handler
+        
+        # Static responses are wrapped once; timestamped ones are kept as
+        # (prefix, middle, suffix) around their two time slots
+        self._service_capabilities = self.soap.wrap_response(SERVICE_CAPABILITIES_RESPONSE)
+        self._event_properties = self.soap.wrap_response(EVENT_PROPERTIES_RESPONSE)
+        self._unsubscribe_response = self.soap.wrap_response(UNSUBSCRIBE_RESPONSE)
+        self._create_pull_point_parts = self._split_time_slots(CREATE_PULL_POINT_SUBSCRIPTION_RESPONSE)
+        self._pull_messages_parts = self._split_time_slots(PULL_MESSAGES_RESPONSE)
+        self._renew_parts = self._split_time_slots(RENEW_RESPONSE)
+        self._subscribe_parts = self._split_time_slots(SUBSCRIBE_RESPONSE)
+        
+        # Map of actions to handlers
+        self.actions = {
+            'GetServiceCapabilities': self._get_service_capabilities,
+            'GetEventProperties': self._get_event_properties,
+            'CreatePullPointSubscription': self._create_pull_point_subscription,
+            'PullMessages': self._pull_messages,
+            'Unsubscribe': self._unsubscribe,
+            'Renew': self._renew,
+            'Subscribe': self._subscribe,
+        }
+        
+    def _split_time_slots(self, template: str) -> tuple:
+        """Wrap a response template and split it around its two time slots."""
+        content = template.format(events_service_url=self.config.events_service_url)
+        prefix, middle, suffix = self.soap.wrap_response(content).split(TIME_SLOT)
+        return prefix, middle, suffix
+        
+    def handle_request(self, body: bytes, soap_action: Optional[str] = None) -> bytes:
+        """Handle incoming SOAP request."""
+        action = self.soap.get_action(body, soap_action)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Events Service action: %s", action)
+        
+        handler = self.actions.get(action)
+        if handler is not None:
+            return handler(body)
+        logger.warning("Unknown action: %s", action)
+        return self.soap.create_fault("ActionNotSupported", f"Action {action} not supported")
+            
+    def _get_service_capabilities(self, body: bytes) -> bytes:
+        """Handle GetServiceCapabilities request."""
+        return self._service_capabilities
+        
+    def _get_event_properties(self, body: bytes) -> bytes:
+        """Handle GetEventProperties request."""
+        return self._event_properties
+        
+    def _create_pull_point_subscription(self, body: bytes) -> bytes:
+        """Handle CreatePullPointSubscription request."""
+        now, termination = _timestamps()
+        prefix, middle, suffix = self._create_pull_point_parts
+        return b"".join((prefix, now, middle, termination, suffix))
+        
+    def _pull_messages(self, body: bytes) -> bytes:
+        """Handle PullMessages request - returns empty (no events)."""
+        now, termination = _timestamps()
+        prefix, middle, suffix = self._pull_messages_parts
+        return b"".join((prefix, now, middle, termination, suffix))
+        
+    def _unsubscribe(self, body: bytes) -> bytes:
+        """Handle Unsubscribe request."""
+        return self._unsubscribe_response
+        
+    def _renew(self, body: bytes) -> bytes:
+        """Handle Renew request."""
+        now, termination = _timestamps()
+        
+        # Renew reports the termination time first
+        prefix, middle, suffix = self._renew_parts
+        return b"".join((prefix, termination, middle, now, suffix))
+        
+    def _subscribe(self, body: bytes) -> bytes:
+        """Handle Subscribe request."""
+        now, termination = _timestamps()
+        prefix, middle, suffix = self._subscribe_parts
+        return b"".join((prefix, now, middle, termination, suffix))
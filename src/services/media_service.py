@@ -1,13 +1,46 @@
 """ONVIF Media Service implementation for Profile S."""
 
 import logging
-from lxml import etree
+from typing import Optional
 
 from src.config import Config
-from src.utils.soap_utils import SoapHandler
+from src.utils.soap_utils import SoapHandler, compact_xml
 
 logger = logging.getLogger(__name__)
 
+# Audio is not supported, so these actions get an empty response element
+EMPTY_RESPONSE_ACTIONS = (
+    'GetAudioSources',
+    'GetAudioSourceConfigurations',
+    'GetAudioEncoderConfigurations',
+)
+
+# Actions answered with the same response as another action
+RESPONSE_ALIASES = {
+    'GetProfile': 'GetProfiles',
+    'GetCompatibleVideoEncoderConfigurations': 'GetVideoEncoderConfigurations',
+    'GetCompatibleVideoSourceConfigurations': 'GetVideoSourceConfigurations',
+}
+
+# URI responses, with a %b slot for the URI itself
+STREAM_URI_RESPONSE = compact_xml(b'''<trt:GetStreamUriResponse>
+            <trt:MediaUri>
+                <tt:Uri>%b</tt:Uri>
+                <tt:InvalidAfterConnect>false</tt:InvalidAfterConnect>
+                <tt:InvalidAfterReboot>false</tt:InvalidAfterReboot>
+                <tt:Timeout>PT60S</tt:Timeout>
+            </trt:MediaUri>
+        </trt:GetStreamUriResponse>''')
+
+SNAPSHOT_URI_RESPONSE = compact_xml(b'''<trt:GetSnapshotUriResponse>
+            <trt:MediaUri>
+                <tt:Uri>%b</tt:Uri>
+                <tt:InvalidAfterConnect>false</tt:InvalidAfterConnect>
+                <tt:InvalidAfterReboot>false</tt:InvalidAfterReboot>
+                <tt:Timeout>PT60S</tt:Timeout>
+            </trt:MediaUri>
+        </trt:GetSnapshotUriResponse>''')
+
 
 class MediaService:
     """ONVIF Media Service for Profile S streaming."""
@@ -16,10 +49,9 @@ class MediaService:
         self.config = config
         self.soap = soap_handler
         
-        # Map of actions to handlers
+        # Map of actions to response builders
         self.actions = {
             'GetProfiles': self._get_profiles,
-            'GetProfile': self._get_profile,
             'GetVideoSources': self._get_video_sources,
             'GetVideoSourceConfigurations': self._get_video_source_configurations,
             'GetVideoSourceConfiguration': self._get_video_source_configuration,
@@ -30,38 +62,41 @@ class MediaService:
             'GetServiceCapabilities': self._get_service_capabilities,
             'GetVideoSourceConfigurationOptions': self._get_video_source_config_options,
             'GetVideoEncoderConfigurationOptions': self._get_video_encoder_config_options,
-            'GetCompatibleVideoEncoderConfigurations': self._get_compatible_video_encoder_configs,
-            'GetCompatibleVideoSourceConfigurations': self._get_compatible_video_source_configs,
-            'GetAudioSources': self._get_audio_sources,
-            'GetAudioSourceConfigurations': self._get_audio_source_configurations,
-            'GetAudioEncoderConfigurations': self._get_audio_encoder_configurations,
         }
         
-    async def handle_request(self, body: bytes) -> bytes:
+        # Responses only depend on config, which is fixed for the process
+        # lifetime, so each one is rendered and wrapped once up front
+        self._responses = {action: builder(b'') for action, builder in self.actions.items()}
+        for action in EMPTY_RESPONSE_ACTIONS:
+            self._responses[action] = self._empty_response(action)
+        for alias, action in RESPONSE_ALIASES.items():
+            self._responses[alias] = self._responses[action]
+        
+    def handle_request(self, body: bytes, soap_action: Optional[str] = None) -> bytes:
         """Handle incoming SOAP request."""
-        action = self.soap.get_action(body)
-        logger.info(f"Media Service action: {action}")
+        action = self.soap.get_action(body, soap_action)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Media Service action: %s", action)
         
-        handler = self.actions.get(action)
-        if handler:
-            return handler(body)
-        else:
-            logger.warning(f"Unknown action: {action}")
-            return self.soap.create_fault("ActionNotSupported", f"Action {action} not supported")
+        response = self._responses.get(action)
+        if response is not None:
+            return response
+        logger.warning("Unknown action: %s", action)
+        return self.soap.create_fault("ActionNotSupported", f"Action {action} not supported")
             
     def _get_profiles(self, body: bytes) -> bytes:
         """Handle GetProfiles request - returns available media profiles."""
         response = f'''
-        <trt:GetProfilesResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
+        <trt:GetProfilesResponse>
             <trt:Profiles token="{self.config.profile_token}" fixed="true">
-                <tt:Name xmlns:tt="http://www.onvif.org/ver10/schema">{self.config.camera_name}</tt:Name>
-                <tt:VideoSourceConfiguration xmlns:tt="http://www.onvif.org/ver10/schema" token="{self.config.video_source_token}">
+                <tt:Name>{self.config.camera_name}</tt:Name>
+                <tt:VideoSourceConfiguration token="{self.config.video_source_token}">
                     <tt:Name>VideoSourceConfig</tt:Name>
                     <tt:UseCount>1</tt:UseCount>
                     <tt:SourceToken>{self.config.video_source_token}</tt:SourceToken>
                     <tt:Bounds x="0" y="0" width="{self.config.stream_width}" height="{self.config.stream_height}"/>
                 </tt:VideoSourceConfiguration>
-                <tt:VideoEncoderConfiguration xmlns:tt="http://www.onvif.org/ver10/schema" token="{self.config.video_encoder_token}">
+                <tt:VideoEncoderConfiguration token="{self.config.video_encoder_token}">
                     <tt:Name>VideoEncoderConfig</tt:Name>
                     <tt:UseCount>1</tt:UseCount>
                     <tt:Encoding>H264</tt:Encoding>
@@ -95,17 +130,13 @@ class MediaService:
         '''
         return self.soap.wrap_response(response)
         
-    def _get_profile(self, body: bytes) -> bytes:
-        """Handle GetProfile request - returns a specific profile."""
-        return self._get_profiles(body)
-        
     def _get_video_sources(self, body: bytes) -> bytes:
         """Handle GetVideoSources request."""
         response = f'''
-        <trt:GetVideoSourcesResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
+        <trt:GetVideoSourcesResponse>
             <trt:VideoSources token="{self.config.video_source_token}">
-                <tt:Framerate xmlns:tt="http://www.onvif.org/ver10/schema">{self.config.stream_fps}</tt:Framerate>
-                <tt:Resolution xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:Framerate>{self.config.stream_fps}</tt:Framerate>
+                <tt:Resolution>
                     <tt:Width>{self.config.stream_width}</tt:Width>
                     <tt:Height>{self.config.stream_height}</tt:Height>
                 </tt:Resolution>
@@ -117,12 +148,12 @@ class MediaService:
     def _get_video_source_configurations(self, body: bytes) -> bytes:
         """Handle GetVideoSourceConfigurations request."""
         response = f'''
-        <trt:GetVideoSourceConfigurationsResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
+        <trt:GetVideoSourceConfigurationsResponse>
             <trt:Configurations token="{self.config.video_source_token}">
-                <tt:Name xmlns:tt="http://www.onvif.org/ver10/schema">VideoSourceConfig</tt:Name>
-                <tt:UseCount xmlns:tt="http://www.onvif.org/ver10/schema">1</tt:UseCount>
-                <tt:SourceToken xmlns:tt="http://www.onvif.org/ver10/schema">{self.config.video_source_token}</tt:SourceToken>
-                <tt:Bounds xmlns:tt="http://www.onvif.org/ver10/schema" x="0" y="0" width="{self.config.stream_width}" height="{self.config.stream_height}"/>
+                <tt:Name>VideoSourceConfig</tt:Name>
+                <tt:UseCount>1</tt:UseCount>
+                <tt:SourceToken>{self.config.video_source_token}</tt:SourceToken>
+                <tt:Bounds x="0" y="0" width="{self.config.stream_width}" height="{self.config.stream_height}"/>
             </trt:Configurations>
         </trt:GetVideoSourceConfigurationsResponse>
         '''
@@ -131,12 +162,12 @@ class MediaService:
     def _get_video_source_configuration(self, body: bytes) -> bytes:
         """Handle GetVideoSourceConfiguration request."""
         response = f'''
-        <trt:GetVideoSourceConfigurationResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
+        <trt:GetVideoSourceConfigurationResponse>
             <trt:Configuration token="{self.config.video_source_token}">
-                <tt:Name xmlns:tt="http://www.onvif.org/ver10/schema">VideoSourceConfig</tt:Name>
-                <tt:UseCount xmlns:tt="http://www.onvif.org/ver10/schema">1</tt:UseCount>
-                <tt:SourceToken xmlns:tt="http://www.onvif.org/ver10/schema">{self.config.video_source_token}</tt:SourceToken>
-                <tt:Bounds xmlns:tt="http://www.onvif.org/ver10/schema" x="0" y="0" width="{self.config.stream_width}" height="{self.config.stream_height}"/>
+                <tt:Name>VideoSourceConfig</tt:Name>
+                <tt:UseCount>1</tt:UseCount>
+                <tt:SourceToken>{self.config.video_source_token}</tt:SourceToken>
+                <tt:Bounds x="0" y="0" width="{self.config.stream_width}" height="{self.config.stream_height}"/>
             </trt:Configuration>
         </trt:GetVideoSourceConfigurationResponse>
         '''
@@ -145,26 +176,26 @@ class MediaService:
     def _get_video_encoder_configurations(self, body: bytes) -> bytes:
         """Handle GetVideoEncoderConfigurations request."""
         response = f'''
-        <trt:GetVideoEncoderConfigurationsResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
+        <trt:GetVideoEncoderConfigurationsResponse>
             <trt:Configurations token="{self.config.video_encoder_token}">
-                <tt:Name xmlns:tt="http://www.onvif.org/ver10/schema">VideoEncoderConfig</tt:Name>
-                <tt:UseCount xmlns:tt="http://www.onvif.org/ver10/schema">1</tt:UseCount>
-                <tt:Encoding xmlns:tt="http://www.onvif.org/ver10/schema">H264</tt:Encoding>
-                <tt:Resolution xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:Name>VideoEncoderConfig</tt:Name>
+                <tt:UseCount>1</tt:UseCount>
+                <tt:Encoding>H264</tt:Encoding>
+                <tt:Resolution>
                     <tt:Width>{self.config.stream_width}</tt:Width>
                     <tt:Height>{self.config.stream_height}</tt:Height>
                 </tt:Resolution>
-                <tt:Quality xmlns:tt="http://www.onvif.org/ver10/schema">5</tt:Quality>
-                <tt:RateControl xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:Quality>5</tt:Quality>
+                <tt:RateControl>
                     <tt:FrameRateLimit>{self.config.stream_fps}</tt:FrameRateLimit>
                     <tt:EncodingInterval>1</tt:EncodingInterval>
                     <tt:BitrateLimit>{self.config.stream_bitrate}</tt:BitrateLimit>
                 </tt:RateControl>
-                <tt:H264 xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:H264>
                     <tt:GovLength>30</tt:GovLength>
                     <tt:H264Profile>Main</tt:H264Profile>
                 </tt:H264>
-                <tt:Multicast xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:Multicast>
                     <tt:Address>
                         <tt:Type>IPv4</tt:Type>
                         <tt:IPv4Address>0.0.0.0</tt:IPv4Address>
@@ -173,7 +204,7 @@ class MediaService:
                     <tt:TTL>0</tt:TTL>
                     <tt:AutoStart>false</tt:AutoStart>
                 </tt:Multicast>
-                <tt:SessionTimeout xmlns:tt="http://www.onvif.org/ver10/schema">PT60S</tt:SessionTimeout>
+                <tt:SessionTimeout>PT60S</tt:SessionTimeout>
             </trt:Configurations>
         </trt:GetVideoEncoderConfigurationsResponse>
         '''
@@ -182,26 +213,26 @@ class MediaService:
     def _get_video_encoder_configuration(self, body: bytes) -> bytes:
         """Handle GetVideoEncoderConfiguration request."""
         response = f'''
-        <trt:GetVideoEncoderConfigurationResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
+        <trt:GetVideoEncoderConfigurationResponse>
             <trt:Configuration token="{self.config.video_encoder_token}">
-                <tt:Name xmlns:tt="http://www.onvif.org/ver10/schema">VideoEncoderConfig</tt:Name>
-                <tt:UseCount xmlns:tt="http://www.onvif.org/ver10/schema">1</tt:UseCount>
-                <tt:Encoding xmlns:tt="http://www.onvif.org/ver10/schema">H264</tt:Encoding>
-                <tt:Resolution xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:Name>VideoEncoderConfig</tt:Name>
+                <tt:UseCount>1</tt:UseCount>
+                <tt:Encoding>H264</tt:Encoding>
+                <tt:Resolution>
                     <tt:Width>{self.config.stream_width}</tt:Width>
                     <tt:Height>{self.config.stream_height}</tt:Height>
                 </tt:Resolution>
-                <tt:Quality xmlns:tt="http://www.onvif.org/ver10/schema">5</tt:Quality>
-                <tt:RateControl xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:Quality>5</tt:Quality>
+                <tt:RateControl>
                     <tt:FrameRateLimit>{self.config.stream_fps}</tt:FrameRateLimit>
                     <tt:EncodingInterval>1</tt:EncodingInterval>
                     <tt:BitrateLimit>{self.config.stream_bitrate}</tt:BitrateLimit>
                 </tt:RateControl>
-                <tt:H264 xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:H264>
                     <tt:GovLength>30</tt:GovLength>
                     <tt:H264Profile>Main</tt:H264Profile>
                 </tt:H264>
-                <tt:Multicast xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:Multicast>
                     <tt:Address>
                         <tt:Type>IPv4</tt:Type>
                         <tt:IPv4Address>0.0.0.0</tt:IPv4Address>
@@ -210,7 +241,7 @@ class MediaService:
                     <tt:TTL>0</tt:TTL>
                     <tt:AutoStart>false</tt:AutoStart>
                 </tt:Multicast>
-                <tt:SessionTimeout xmlns:tt="http://www.onvif.org/ver10/schema">PT60S</tt:SessionTimeout>
+                <tt:SessionTimeout>PT60S</tt:SessionTimeout>
             </trt:Configuration>
         </trt:GetVideoEncoderConfigurationResponse>
         '''
@@ -219,39 +250,19 @@ class MediaService:
     def _get_stream_uri(self, body: bytes) -> bytes:
         """Handle GetStreamUri request - THE KEY METHOD for streaming."""
         # Return the proxied RTSP URL
-        stream_uri = self.config.proxy_rtsp_url
-        
-        response = f'''
-        <trt:GetStreamUriResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
-            <trt:MediaUri>
-                <tt:Uri xmlns:tt="http://www.onvif.org/ver10/schema">{stream_uri}</tt:Uri>
-                <tt:InvalidAfterConnect xmlns:tt="http://www.onvif.org/ver10/schema">false</tt:InvalidAfterConnect>
-                <tt:InvalidAfterReboot xmlns:tt="http://www.onvif.org/ver10/schema">false</tt:InvalidAfterReboot>
-                <tt:Timeout xmlns:tt="http://www.onvif.org/ver10/schema">PT60S</tt:Timeout>
-            </trt:MediaUri>
-        </trt:GetStreamUriResponse>
-        '''
-        return self.soap.wrap_response(response)
+        stream_uri = self.config.proxy_rtsp_url.encode('utf-8')
+        return self.soap.wrap_response_bytes(STREAM_URI_RESPONSE % stream_uri)
         
     def _get_snapshot_uri(self, body: bytes) -> bytes:
         """Handle GetSnapshotUri request."""
         # We don't have a snapshot endpoint, return empty/error
-        response = f'''
-        <trt:GetSnapshotUriResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
-            <trt:MediaUri>
-                <tt:Uri xmlns:tt="http://www.onvif.org/ver10/schema">http://{self.config.server_ip}:{self.config.onvif_port}/snapshot</tt:Uri>
-                <tt:InvalidAfterConnect xmlns:tt="http://www.onvif.org/ver10/schema">false</tt:InvalidAfterConnect>
-                <tt:InvalidAfterReboot xmlns:tt="http://www.onvif.org/ver10/schema">false</tt:InvalidAfterReboot>
-                <tt:Timeout xmlns:tt="http://www.onvif.org/ver10/schema">PT60S</tt:Timeout>
-            </trt:MediaUri>
-        </trt:GetSnapshotUriResponse>
-        '''
-        return self.soap.wrap_response(response)
+        snapshot_uri = b'http://%b:%d/snapshot' % (self.config.server_ip.encode('utf-8'), self.config.onvif_port)
+        return self.soap.wrap_response_bytes(SNAPSHOT_URI_RESPONSE % snapshot_uri)
         
     def _get_service_capabilities(self, body: bytes) -> bytes:
         """Handle GetServiceCapabilities request."""
         response = '''
-        <trt:GetServiceCapabilitiesResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
+        <trt:GetServiceCapabilitiesResponse>
             <trt:Capabilities SnapshotUri="false" Rotation="false" VideoSourceMode="false" OSD="false">
                 <trt:ProfileCapabilities MaximumNumberOfProfiles="1"/>
                 <trt:StreamingCapabilities RTPMulticast="false" RTP_TCP="true" RTP_RTSP_TCP="true" NonAggregateControl="false"/>
@@ -263,9 +274,9 @@ class MediaService:
     def _get_video_source_config_options(self, body: bytes) -> bytes:
         """Handle GetVideoSourceConfigurationOptions request."""
         response = f'''
-        <trt:GetVideoSourceConfigurationOptionsResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
+        <trt:GetVideoSourceConfigurationOptionsResponse>
             <trt:Options>
-                <tt:BoundsRange xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:BoundsRange>
                     <tt:XRange>
                         <tt:Min>0</tt:Min>
                         <tt:Max>0</tt:Max>
@@ -283,7 +294,7 @@ class MediaService:
                         <tt:Max>{self.config.stream_height}</tt:Max>
                     </tt:HeightRange>
                 </tt:BoundsRange>
-                <tt:VideoSourceTokensAvailable xmlns:tt="http://www.onvif.org/ver10/schema">{self.config.video_source_token}</tt:VideoSourceTokensAvailable>
+                <tt:VideoSourceTokensAvailable>{self.config.video_source_token}</tt:VideoSourceTokensAvailable>
             </trt:Options>
         </trt:GetVideoSourceConfigurationOptionsResponse>
         '''
@@ -292,13 +303,13 @@ class MediaService:
     def _get_video_encoder_config_options(self, body: bytes) -> bytes:
         """Handle GetVideoEncoderConfigurationOptions request."""
         response = f'''
-        <trt:GetVideoEncoderConfigurationOptionsResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
+        <trt:GetVideoEncoderConfigurationOptionsResponse>
             <trt:Options>
-                <tt:QualityRange xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:QualityRange>
                     <tt:Min>1</tt:Min>
                     <tt:Max>10</tt:Max>
                 </tt:QualityRange>
-                <tt:H264 xmlns:tt="http://www.onvif.org/ver10/schema">
+                <tt:H264>
                     <tt:ResolutionsAvailable>
                         <tt:Width>{self.config.stream_width}</tt:Width>
                         <tt:Height>{self.config.stream_height}</tt:Height>
@@ -324,34 +335,6 @@ class MediaService:
         '''
         return self.soap.wrap_response(response)
         
-    def _get_compatible_video_encoder_configs(self, body: bytes) -> bytes:
-        """Handle GetCompatibleVideoEncoderConfigurations request."""
-        return self._get_video_encoder_configurations(body)
-        
-    def _get_compatible_video_source_configs(self, body: bytes) -> bytes:
-        """Handle GetCompatibleVideoSourceConfigurations request."""
-        return self._get_video_source_configurations(body)
-        
-    def _get_audio_sources(self, body: bytes) -> bytes:
-        """Handle GetAudioSources request - no audio support."""
-        response = '''
-        <trt:GetAudioSourcesResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
-        </trt:GetAudioSourcesResponse>
-        '''
-        return self.soap.wrap_response(response)
-        
-    def _get_audio_source_configurations(self, body: bytes) -> bytes:
-        """Handle GetAudioSourceConfigurations request - no audio support."""
-        response = '''
-        <trt:GetAudioSourceConfigurationsResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
-        </trt:GetAudioSourceConfigurationsResponse>
-        '''
-        return self.soap.wrap_response(response)
-        
-    def _get_audio_encoder_configurations(self, body: bytes) -> bytes:
-        """Handle GetAudioEncoderConfigurations request - no audio support."""
-        response = '''
-        <trt:GetAudioEncoderConfigurationsResponse xmlns:trt="http://www.onvif.org/ver10/media/wsdl">
-        </trt:GetAudioEncoderConfigurationsResponse>
-        '''
-        return self.soap.wrap_response(response)
+    def _empty_response(self, action: str) -> bytes:
+        """Build the empty response for an unsupported (audio) action."""
+        return self.soap.wrap_response_bytes(b'<trt:%bResponse/>' % action.encode('ascii'))
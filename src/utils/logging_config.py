@@ -1,13 +1,42 @@
 """Logging configuration for ONVIF-RTSP Bridge."""
 
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 import sys
-from datetime import datetime
+import time
+
+# Log files rotate at this size, keeping this many old files
+LOG_MAX_BYTES = 64 << 20
+LOG_BACKUP_COUNT = 5
+
+# Writes records to the console and file on a background thread
+_listener = None
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """Formatter that renders the timestamp once per second."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._time_second = None
+        self._time_text = ''
+        
+    def formatTime(self, record, datefmt=None):
+        """Return the record time, reusing the text rendered for the same second."""
+        second = int(record.created)
+        if second != self._time_second:
+            # Whole seconds only, so the format must not include milliseconds
+            self._time_text = time.strftime(datefmt or self.default_time_format, self.converter(second))
+            self._time_second = second
+        return self._time_text
 
 
 def setup_logging(log_level: str = None):
     """Configure application logging."""
+    global _listener
     
     # Determine log level
     if log_level is None:
@@ -16,7 +45,7 @@ def setup_logging(log_level: str = None):
     level = getattr(logging, log_level.upper(), logging.INFO)
     
     # Create formatter
-    formatter = logging.Formatter(
+    formatter = CachedTimeFormatter(
         '%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
@@ -25,22 +54,36 @@ def setup_logging(log_level: str = None):
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
+    handlers = [console_handler]
     
-    # File handler (if logs directory exists)
-    file_handler = None
-    log_dir = '/app/logs'
-    if os.path.exists(log_dir):
-        log_file = os.path.join(log_dir, f'onvif-bridge-{datetime.now().strftime("%Y%m%d")}.log')
-        file_handler = logging.FileHandler(log_file)
+    # File handler (if logs directory exists); opening it directly saves a
+    # separate existence check
+    log_file = f'/app/logs/onvif-bridge-{time.strftime("%Y%m%d")}.log'
+    try:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding='utf-8'
+        )
+    except FileNotFoundError:
+        pass
+    else:
         file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    
+    # Callers only enqueue records; the listener thread does the console and
+    # disk writes, so logging never blocks the event loop on I/O
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
     
     # Configure root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
-    root_logger.addHandler(console_handler)
-    if file_handler:
-        root_logger.addHandler(file_handler)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
     
     # Reduce noise from third-party libraries
     logging.getLogger('aiohttp').setLevel(logging.WARNING)
@@ -1,7 +1,10 @@
 """SOAP utilities for ONVIF services."""
 
 import re
+import html
 import logging
+from functools import lru_cache
+from typing import Optional
 from lxml import etree
 from datetime import datetime, timezone
 
@@ -13,6 +16,7 @@ logger = logging.getLogger(__name__)
 NAMESPACES = {
     'soap': 'http://www.w3.org/2003/05/soap-envelope',
     'soap12': 'http://www.w3.org/2003/05/soap-envelope',
+    'soap11': 'http://schemas.xmlsoap.org/soap/envelope/',
     'wsse': 'http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd',
     'wsu': 'http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-utility-1.0.xsd',
     'tds': 'http://www.onvif.org/ver10/device/wsdl',
@@ -24,59 +28,62 @@ NAMESPACES = {
     'wstop': 'http://docs.oasis-open.org/wsn/t-1',
 }
 
+# Precompiled lookups for the parsed-XML paths
+_BODY_XPATH = etree.XPath('/soap:Envelope/soap:Body/*[1]', namespaces=NAMESPACES)
+_BODY_XPATH_1_1 = etree.XPath('/soap11:Envelope/soap11:Body/*[1]', namespaces=NAMESPACES)
+_SEC_XPATH = etree.XPath('//wsse:Security', namespaces=NAMESPACES)
+_USERTOKEN_XPATH = etree.XPath('.//wsse:UsernameToken', namespaces=NAMESPACES)
+_USERNAME_XPATH = etree.XPath('.//wsse:Username', namespaces=NAMESPACES)
+_PASSWORD_XPATH = etree.XPath('.//wsse:Password', namespaces=NAMESPACES)
 
-class SoapHandler:
-    """Handles SOAP message parsing and creation."""
-    
-    def __init__(self, config: Config):
-        self.config = config
-        
-    def get_action(self, body: bytes) -> str:
-        """Extract the SOAP action from the request body."""
-        try:
-            # Parse the XML
-            root = etree.fromstring(body)
-            
-            # Find the Body element
-            body_elem = root.find('.//{http://www.w3.org/2003/05/soap-envelope}Body')
-            if body_elem is None:
-                body_elem = root.find('.//{http://schemas.xmlsoap.org/soap/envelope/}Body')
-            
-            if body_elem is not None and len(body_elem) > 0:
-                # Get the first child element (the action)
-                action_elem = body_elem[0]
-                # Extract just the local name (without namespace)
-                action = etree.QName(action_elem.tag).localname
-                return action
-                
-        except Exception as e:
-            logger.error(f"Error parsing SOAP action: {e}")
-            
-        # Fallback: try regex
-        try:
-            body_str = body.decode('utf-8')
-            # Look for common action patterns
-            patterns = [
-                r'<\w+:(\w+)\s*xmlns',  # <tds:GetDeviceInformation xmlns...
-                r'<(\w+)\s*xmlns',       # <GetDeviceInformation xmlns...
-                r'<\w+:(\w+)>',          # <tds:GetDeviceInformation>
-                r'<(\w+)/>',             # <GetDeviceInformation/>
-            ]
-            for pattern in patterns:
-                match = re.search(pattern, body_str)
-                if match:
-                    action = match.group(1)
-                    # Filter out common non-action elements
-                    if action not in ['Envelope', 'Header', 'Body', 'Security']:
-                        return action
-        except Exception as e:
-            logger.error(f"Error in regex action extraction: {e}")
-            
-        return "Unknown"
-        
-    def wrap_response(self, content: str) -> bytes:
-        """Wrap response content in a SOAP envelope."""
-        envelope = f'''<?xml version="1.0" encoding="UTF-8"?>
+# Shared parser for request bodies; never fetches or expands external content
+_PARSER = etree.XMLParser(
+    resolve_entities=False,
+    no_network=True,
+    huge_tree=False,
+    remove_blank_text=True,
+    collect_ids=False
+)
+
+# First element inside the SOAP Body - the requested operation. Prefixes are
+# NCNames (may contain '-' and '.'); the name must end the tag's QName, or the
+# body is left to the parser
+_BODY_RE = re.compile(rb'<(?:[\w.-]+:)?Body(?:\s[^>]*)?>\s*<(?:([\w.-]+):)?(\w+)(?=[\s/>])')
+
+# WS-Addressing Action header; it sits in the SOAP header, so only the
+# start of the request is scanned for it
+_ACTION_RE = re.compile(rb'<(?:\w+:)?Action\b[^>]*>\s*([^<\s]+)\s*</')
+_ACTION_SCAN_LIMIT = 4096
+
+# Last-resort scan for malformed bodies: any element opening with a namespace
+# declaration or closing its start tag directly, e.g. <tds:GetNTP xmlns...> or <GetNTP/>
+_FALLBACK_RE = re.compile(rb'<(?:[\w.-]+:)?(?P<name>\w+)(?:\s+xmlns|\s*/?>)')
+_NON_ACTION_ELEMENTS = frozenset({
+    b'Envelope', b'Header', b'Body', b'Security', b'UsernameToken', b'Username',
+    b'Password', b'Nonce', b'Created', b'Action', b'MessageID', b'ReplyTo',
+    b'Address', b'To',
+})
+
+# Whitespace between tags and inside them; response templates are indented
+# for reading only. Quoted attribute values are matched first so they are
+# kept as written
+_INTER_TAG_WS_RE = re.compile(rb'>\s+<')
+_TAG_RE = re.compile(rb'<(?:[^<>"\']|"[^"]*"|\'[^\']*\')+>')
+_TAG_WS_RE = re.compile(rb'("[^"]*"|\'[^\']*\')|\s+(/?>)?')
+
+
+def _compact_tag(match: re.Match) -> bytes:
+    """Collapse whitespace runs in a tag to single spaces, dropping any before its end."""
+    return _TAG_WS_RE.sub(lambda ws: ws.group(1) or ws.group(2) or b' ', match.group(0))
+
+
+def compact_xml(xml: bytes) -> bytes:
+    """Drop the indentation between and inside the tags of a response template."""
+    return _TAG_RE.sub(_compact_tag, _INTER_TAG_WS_RE.sub(b'><', xml)).strip()
+
+
+# Response envelope, split around the Body content and encoded once
+_ENV_PREFIX, _ENV_SUFFIX = (compact_xml(part) for part in '''<?xml version="1.0" encoding="UTF-8"?>
 <soap:Envelope 
     xmlns:soap="http://www.w3.org/2003/05/soap-envelope"
     xmlns:tds="http://www.onvif.org/ver10/device/wsdl"
@@ -87,50 +94,139 @@ class SoapHandler:
     xmlns:wsnt="http://docs.oasis-open.org/wsn/b-2"
     xmlns:wstop="http://docs.oasis-open.org/wsn/t-1">
     <soap:Body>
-        {content.strip()}
+        {content}
     </soap:Body>
-</soap:Envelope>'''
-        return envelope.encode('utf-8')
-        
-    def create_fault(self, code: str, message: str) -> bytes:
-        """Create a SOAP fault response."""
-        fault = f'''<?xml version="1.0" encoding="UTF-8"?>
+</soap:Envelope>'''.encode('utf-8').split(b'{content}'))
+
+# Fault envelope with slots for the fault code and reason text
+_FAULT_TMPL = compact_xml(b'''<?xml version="1.0" encoding="UTF-8"?>
 <soap:Envelope xmlns:soap="http://www.w3.org/2003/05/soap-envelope">
     <soap:Body>
         <soap:Fault>
             <soap:Code>
-                <soap:Value>soap:{code}</soap:Value>
+                <soap:Value>soap:%b</soap:Value>
             </soap:Code>
             <soap:Reason>
-                <soap:Text xml:lang="en">{message}</soap:Text>
+                <soap:Text xml:lang="en">%b</soap:Text>
             </soap:Reason>
         </soap:Fault>
     </soap:Body>
-</soap:Envelope>'''
-        return fault.encode('utf-8')
+</soap:Envelope>''')
+FAULT_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=FAULT_CACHE_SIZE)
+def _render_fault(code: str, message: str) -> bytes:
+    """Render a SOAP fault; repeated faults come from the cache."""
+    return _FAULT_TMPL % (code.encode('ascii'), html.escape(message, quote=False).encode('utf-8'))
+
+
+# Memo for the parsing fallback of get_action; large bodies bypass it so the
+# cache never pins more than ACTION_CACHE_SIZE * ACTION_CACHE_MAX_BODY bytes
+ACTION_CACHE_SIZE = 64
+ACTION_CACHE_MAX_BODY = 16 * 1024
+
+
+@lru_cache(maxsize=ACTION_CACHE_SIZE)
+def _parse_action(body: bytes) -> str:
+    """Extract the SOAP action by parsing the body, with a regex last resort."""
+    try:
+        # Parse the XML
+        root = etree.fromstring(body, _PARSER)
+        
+        # First child of the SOAP 1.2 or 1.1 Body is the action
+        nodes = _BODY_XPATH(root) or _BODY_XPATH_1_1(root)
+        if nodes:
+            # Extract just the local name (without namespace)
+            return etree.QName(nodes[0].tag).localname
+            
+    except Exception as e:
+        logger.error("Error parsing SOAP action: %s", e)
+        
+    # Fallback: first element in document order that is not envelope or header plumbing
+    for match in _FALLBACK_RE.finditer(body):
+        name = match.group('name')
+        if name not in _NON_ACTION_ELEMENTS:
+            return name.decode('ascii')
+            
+    return "Unknown"
+
+
+def action_from_uri(uri: str) -> Optional[str]:
+    """Extract the operation name from a SOAP action URI."""
+    # e.g. http://www.onvif.org/ver10/events/wsdl/EventPortType/PullMessagesRequest
+    action = uri.strip().strip('"').rsplit('/', 1)[-1]
+    if action.endswith('Request') and len(action) > len('Request'):
+        action = action[:-len('Request')]
+    return action if action.isidentifier() else None
+
+
+class SoapHandler:
+    """Handles SOAP message parsing and creation."""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        
+    def get_action(self, body: bytes, soap_action: Optional[str] = None) -> str:
+        """Extract the SOAP action, preferring the HTTP SOAPAction over the request body."""
+        # Compliant clients name the operation in the SOAPAction header (or the
+        # SOAP 1.2 Content-Type action parameter), which needs no body scan
+        if soap_action:
+            action = action_from_uri(soap_action)
+            if action:
+                return action
+                
+        # Fast path: read the first Body child's local name without parsing XML
+        match = _BODY_RE.search(body)
+        if match:
+            return match.group(2).decode('ascii')
+            
+        # Then the WS-Addressing Action header
+        match = _ACTION_RE.search(body, 0, _ACTION_SCAN_LIMIT)
+        if match:
+            action = action_from_uri(match.group(1).decode('utf-8', errors='replace'))
+            if action:
+                return action
+                
+        # Slow path; clients re-sending an identical body hit the cache
+        if len(body) <= ACTION_CACHE_MAX_BODY:
+            return _parse_action(body)
+        return _parse_action.__wrapped__(body)
+        
+    def wrap_response(self, content: str) -> bytes:
+        """Wrap response content in a SOAP envelope."""
+        return self.wrap_response_bytes(compact_xml(content.encode('utf-8')))
+        
+    def wrap_response_bytes(self, content: bytes) -> bytes:
+        """Wrap already-encoded response content in a SOAP envelope."""
+        return b''.join((_ENV_PREFIX, content, _ENV_SUFFIX))
+        
+    def create_fault(self, code: str, message: str) -> bytes:
+        """Create a SOAP fault response."""
+        return _render_fault(code, message)
         
     def validate_auth(self, body: bytes) -> bool:
         """Validate WS-Security authentication in SOAP header."""
         try:
-            root = etree.fromstring(body)
+            root = etree.fromstring(body, _PARSER)
             
             # Find Security header
-            security = root.find('.//{http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd}Security')
-            if security is None:
+            security = _SEC_XPATH(root)
+            if not security:
                 # No security header - allow for now (some clients don't send auth initially)
                 return True
                 
             # Find UsernameToken
-            username_token = security.find('.//{http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd}UsernameToken')
-            if username_token is None:
+            username_token = _USERTOKEN_XPATH(security[0])
+            if not username_token:
                 return True
                 
-            username_elem = username_token.find('.//{http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd}Username')
-            password_elem = username_token.find('.//{http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd}Password')
+            username_elem = _USERNAME_XPATH(username_token[0])
+            password_elem = _PASSWORD_XPATH(username_token[0])
             
-            if username_elem is not None and password_elem is not None:
-                username = username_elem.text
-                password = password_elem.text
+            if username_elem and password_elem:
+                username = username_elem[0].text
+                password = password_elem[0].text
                 
                 # Simple password check (in production, use proper hashing)
                 if username == self.config.onvif_username and password == self.config.onvif_password:
@@ -141,5 +237,5 @@ class SoapHandler:
             return True
             
         except Exception as e:
-            logger.error(f"Error validating auth: {e}")
+            logger.error("Error validating auth: %s", e)
             return True  # Allow on error for compatibility
@@ -0,0 +1,81 @@
+"""Tests for the WS-Discovery service."""
+
+import time
+import unittest
+
+from src.config import Config
+from src.discovery import PROBE_RATE_LIMIT, WsDiscoveryService, _WsdProtocol
+
+PROBER = ('192.0.2.10', 40000)
+
+
+def probe(message_id: str) -> bytes:
+    """Build a WS-Discovery Probe for NetworkVideoTransmitter devices."""
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope"'
+        ' xmlns:a="http://schemas.xmlsoap.org/ws/2004/08/addressing"'
+        ' xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery"'
+        ' xmlns:dn="http://www.onvif.org/ver10/network/wsdl">'
+        f'<s:Header><a:MessageID>urn:uuid:{message_id}</a:MessageID></s:Header>'
+        '<s:Body><d:Probe><d:Types>dn:NetworkVideoTransmitter</d:Types></d:Probe></s:Body>'
+        '</s:Envelope>'
+    ).encode('utf-8')
+
+
+class FakeTransport:
+    """Datagram transport recording what is sent."""
+
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append((bytes(data), addr))
+
+
+class ProbeDedupTest(unittest.TestCase):
+    """Coalescing of repeated Probes."""
+
+    def setUp(self):
+        self.service = WsDiscoveryService(Config())
+        self.transport = FakeTransport()
+        self.protocol = _WsdProtocol(self.service)
+        self.protocol.connection_made(self.transport)
+
+    def test_retransmit_is_ignored(self):
+        self.protocol.datagram_received(probe('1'), PROBER)
+        self.protocol.datagram_received(probe('1'), PROBER)
+        self.assertEqual(len(self.transport.sent), 1)
+
+    def test_distinct_message_id_from_same_addr_gets_reply(self):
+        self.protocol.datagram_received(probe('1'), PROBER)
+        self.protocol.datagram_received(probe('2'), PROBER)
+        self.assertEqual(len(self.transport.sent), 2)
+        self.assertIn(b'urn:uuid:2</wsa:RelatesTo>', self.transport.sent[1][0])
+
+    def test_rate_limited_probe_retransmit_is_answered(self):
+        # Saturate the rate limit so the first Probe is dropped
+        now = time.monotonic()
+        self.service._probe_times.extend([now] * PROBE_RATE_LIMIT)
+        self.protocol.datagram_received(probe('1'), PROBER)
+        self.assertEqual(self.transport.sent, [])
+
+        # Once the window has passed, the retransmit gets its ProbeMatch
+        self.service._probe_times.clear()
+        self.protocol.datagram_received(probe('1'), PROBER)
+        self.assertEqual(len(self.transport.sent), 1)
+
+
+
+class ProbeMatchTest(unittest.TestCase):
+    """Rendered ProbeMatch messages."""
+
+    def test_probe_match_has_no_newlines(self):
+        service = WsDiscoveryService(Config())
+        probe_match, _ = service._process_message(probe('1'), PROBER)
+        self.assertNotIn(b'\n', bytes(probe_match))
+        self.assertIn(b'<soap:Envelope xmlns:soap=', bytes(probe_match))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Tests for SOAP utilities."""
+
+import unittest
+
+from src.config import Config
+from src.utils.soap_utils import SoapHandler, compact_xml
+
+
+def envelope(body: str, envelope_prefix: str = 's') -> bytes:
+    """Build a SOAP 1.2 request around the given Body content."""
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<{envelope_prefix}:Envelope xmlns:{envelope_prefix}="http://www.w3.org/2003/05/soap-envelope">'
+        f'<{envelope_prefix}:Body>{body}</{envelope_prefix}:Body>'
+        f'</{envelope_prefix}:Envelope>'
+    ).encode('utf-8')
+
+
+class GetActionTest(unittest.TestCase):
+    """SoapHandler.get_action."""
+
+    def setUp(self):
+        self.soap = SoapHandler(Config())
+
+    def test_plain_prefix(self):
+        body = envelope('<trt:GetProfiles xmlns:trt="http://www.onvif.org/ver10/media/wsdl"/>')
+        self.assertEqual(self.soap.get_action(body), 'GetProfiles')
+
+    def test_hyphenated_prefix(self):
+        body = envelope('<ns-1:GetProfiles xmlns:ns-1="http://www.onvif.org/ver10/media/wsdl"/>')
+        self.assertEqual(self.soap.get_action(body), 'GetProfiles')
+
+    def test_dotted_prefixes(self):
+        body = envelope(
+            '<ns.a:GetStreamUri xmlns:ns.a="http://www.onvif.org/ver10/media/wsdl"></ns.a:GetStreamUri>',
+            envelope_prefix='env.1'
+        )
+        self.assertEqual(self.soap.get_action(body), 'GetStreamUri')
+
+    def test_soap_action_header_wins(self):
+        body = envelope('<trt:GetProfiles xmlns:trt="http://www.onvif.org/ver10/media/wsdl"/>')
+        action = self.soap.get_action(body, '"http://www.onvif.org/ver10/media/wsdl/GetStreamUri"')
+        self.assertEqual(action, 'GetStreamUri')
+
+
+
+class CompactResponseTest(unittest.TestCase):
+    """Template whitespace is stripped from rendered responses."""
+
+    def setUp(self):
+        self.soap = SoapHandler(Config())
+
+    def test_wrapped_response_has_no_newlines(self):
+        response = self.soap.wrap_response("""
+        <tds:GetNTPResponse>
+            <tds:NTPInformation>
+                <tt:FromDHCP>false</tt:FromDHCP>
+            </tds:NTPInformation>
+        </tds:GetNTPResponse>
+        """)
+        self.assertNotIn(b'\n', response)
+        self.assertIn(b'<soap:Envelope xmlns:soap=', response)
+
+    def test_fault_has_no_newlines(self):
+        self.assertNotIn(b'\n', self.soap.create_fault('Receiver', 'Broken'))
+
+    def test_tag_whitespace_collapsed_outside_quotes(self):
+        compacted = compact_xml(b'<a \n    x="1  2"\n    y="3" >\n    <b c="d" />\n</a>')
+        self.assertEqual(compacted, b'<a x="1  2" y="3"><b c="d"/></a>')
+
+
+if __name__ == '__main__':
+    unittest.main()